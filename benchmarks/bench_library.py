@@ -0,0 +1,193 @@
+"""Time the library, picking and playlist paths of the web player at several library sizes.
+
+For every size a synthetic library is generated once (see generate_library)
+and the measurements run in a fresh process with its own working directory,
+so each size starts with an empty cache/library.db. Results are written as
+JSON; pass an earlier result file as --compare to see the change per timing.
+
+    python benchmarks/bench_library.py --sizes 1000 10000 100000 --output results.json
+    python benchmarks/bench_library.py --sizes 1000 --compare results.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+APP_DIR = os.path.join(REPO_ROOT, "music_player_gradio")
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_REPEAT = 5
+PICK_REPEAT = 20
+TAG_SAMPLE = 500  # get_tags is timed on this many files
+PICK_COUNT = 20
+
+
+def summarize(times):
+    return {"runs": len(times), "min_s": min(times), "median_s": statistics.median(times),
+            "mean_s": statistics.fmean(times), "max_s": max(times)}
+
+
+def timed(repeat, fn, *args, **kwargs):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+    return summarize(times)
+
+
+# --- Measurements (child process) ---
+
+def run_child(library, size, repeat, output):
+    # Imported here: the app opens cache/library.db in the working directory on import
+    sys.path.insert(0, APP_DIR)
+    import music_player_gradio as app
+    from fastapi.testclient import TestClient
+
+    folders = [library]
+    results = {"tracks": size}
+    results["get_audio_files"] = timed(repeat, app.get_audio_files, folders, app.AUDIO_EXTS)
+    files = app.get_audio_files(folders, app.AUDIO_EXTS)
+    sample = random.Random(0).sample(files, min(TAG_SAMPLE, len(files)))
+    tag_times = timed(repeat, lambda: [app.get_tags(f) for f in sample])
+    results["get_tags"] = dict(tag_times, files=len(sample),
+                               per_file_median_s=tag_times["median_s"] / max(1, len(sample)))
+
+    # Cold: every file is read; warm: nothing changed, only fingerprints are compared
+    results["background_scan_cold"] = timed(1, app.background_scan, folders)
+    app.stop_library_watcher()
+    results["background_scan_warm"] = timed(min(repeat, 3), app.background_scan, folders)
+    app.stop_library_watcher()
+    # The track store: rewriting rows in one batch, and building the catalog from it
+    rows = [(f, app.player.tags_cache[f], app.track_store.fingerprint(f)) for f in sample]
+
+    def store_rows():
+        for row in rows:
+            app.track_store.put(*row)
+        app.track_store.flush()
+
+    results["track_store_write"] = dict(timed(repeat, store_rows), rows=len(rows))
+    results["load_library_index"] = timed(repeat, app.load_library_index)
+    results["restore_scan_cache"] = timed(min(repeat, 3), app.restore_scan_cache)
+
+    genres = sorted(app.player.genres)[:2]
+    results["pick_songs"] = timed(PICK_REPEAT, app.pick_songs, PICK_COUNT)
+    results["pick_songs_genres"] = timed(PICK_REPEAT, app.pick_songs, PICK_COUNT, genres)
+    results["pick_songs_by_duration"] = timed(PICK_REPEAT, app.pick_songs_by_duration, 60, genres)
+    results["pick_songs_by_filters"] = timed(PICK_REPEAT, app.pick_songs_by_filters, PICK_COUNT, genres,
+                                             title_keywords=["night river"], year_start=1980, year_end=2010)
+
+    client = TestClient(app.app)
+    # A new session starts out with pick_count songs of the shared playlist
+    results["playlist_new_session"] = timed(1, client.get, "/playlist")
+
+    def new_pick_then_playlist():
+        client.post("/pick_songs", json={"count": PICK_COUNT})
+        client.get("/playlist")
+
+    results["pick_songs_api_and_playlist"] = timed(PICK_REPEAT, new_pick_then_playlist)
+    client.post("/pick_songs", json={"count": PICK_COUNT})
+    etag = client.get("/playlist").headers.get("etag")
+    results["playlist_cached"] = timed(PICK_REPEAT, client.get, "/playlist")
+    results["playlist_not_modified"] = timed(PICK_REPEAT, client.get, "/playlist",
+                                             headers={"If-None-Match": etag or ""})
+    results["latency"] = client.get("/metrics/latency").json()["endpoints"]
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f)
+
+
+# --- Driver ---
+
+def ensure_library(data_dir, size, seed):
+    """Generated library for size, reused while its marker says it is complete."""
+    from generate_library import generate_library, verify_tags
+    root = os.path.join(data_dir, f"library-{size}-{seed}")
+    marker = os.path.join(root, ".complete")
+    if not os.path.exists(marker):
+        print(f"[Bench] Generating {size} tracks in {root}...")
+        start = time.perf_counter()
+        paths = generate_library(root, size, seed)
+        verify_tags(paths, seed=seed)
+        with open(marker, "w") as f:
+            f.write(str(size))
+        print(f"[Bench] Generated in {time.perf_counter() - start:.1f}s")
+    return root
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(library, size, repeat, verbose):
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        output = os.path.join(workdir, "result.json")
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", library, "--sizes", str(size),
+               "--repeat", str(repeat), "--output", output]
+        stdout = None if verbose else subprocess.DEVNULL
+        subprocess.run(cmd, cwd=workdir, stdout=stdout, check=True)
+        with open(output, encoding="utf-8") as f:
+            return json.load(f)
+
+
+def compare(baseline, current):
+    """Print median time ratios current / baseline for the timings both runs have."""
+    for size, timings in current["results"].items():
+        before = baseline.get("results", {}).get(size)
+        if not before:
+            continue
+        print(f"\n{size} tracks ({baseline['meta'].get('commit')} -> {current['meta'].get('commit')})")
+        for name, stats in timings.items():
+            old = before.get(name)
+            if not isinstance(stats, dict) or "median_s" not in stats or not old or not old.get("median_s"):
+                continue
+            ratio = stats["median_s"] / old["median_s"]
+            print(f"  {name:32} {old['median_s'] * 1000:10.2f} ms -> {stats['median_s'] * 1000:10.2f} ms  x{ratio:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "rmp-bench"),
+                        help="Where generated libraries are kept between runs")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's output")
+    parser.add_argument("--child", metavar="LIBRARY", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return run_child(args.child, args.sizes[0], args.repeat, args.output)
+
+    sys.path.insert(0, BENCH_DIR)
+    report = {"meta": {"commit": git_commit(), "python": platform.python_version(),
+                       "platform": platform.platform(), "cpus": os.cpu_count(),
+                       "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": args.repeat, "seed": args.seed},
+              "results": {}}
+    for size in args.sizes:
+        library = ensure_library(args.data_dir, size, args.seed)
+        print(f"[Bench] Measuring {size} tracks...")
+        report["results"][str(size)] = measure(library, size, args.repeat, args.verbose)
+        # Written after every size, so a long run still leaves usable results
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(f"[Bench] Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""Write a synthetic tagged music library for the benchmarks.
+
+Files are laid out as <root>/<artist>/<album> (<year>)/<nn> - <title>.<ext>
+with realistic tags (title, artist, album, genres, year), a duration in the
+stream header and cover art as a folder cover.jpg, as embedded art or not at
+all. The audio itself is a few silent MP3 frames (with a Xing header giving
+the duration) or a bare FLAC STREAMINFO, so 100k tracks fit in a few hundred
+MB and every file parses like a real one in mutagen.
+
+    python benchmarks/generate_library.py /tmp/library 10000
+"""
+import io
+import os
+import sys
+import random
+import struct
+import argparse
+
+from mutagen.flac import FLAC, Picture
+from mutagen.easyid3 import EasyID3
+from mutagen.id3 import ID3, APIC
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+GENRES = ["Rock", "Pop", "Jazz", "Blues", "Classical", "Electronic", "Hip-Hop", "Metal", "Folk",
+          "Country", "Reggae", "Soul", "Funk", "Ambient", "Punk", "Indie", "Latin", "World"]
+WORDS = ["night", "blue", "river", "fire", "dream", "city", "heart", "light", "road", "rain", "gold",
+         "shadow", "summer", "ghost", "wild", "electric", "silver", "ocean", "mountain", "echo"]
+TRACKS_PER_ALBUM = (6, 14)
+ALBUMS_PER_ARTIST = (1, 6)
+DURATION_RANGE = (90, 480)  # Seconds
+FLAC_SHARE = 0.3
+# Share of albums with a folder cover.jpg, with embedded art; the rest have none
+FOLDER_COVER_SHARE, EMBEDDED_COVER_SHARE = 0.6, 0.2
+VERIFY_SAMPLE = 20  # Generated files read back through the web player's tag reader
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "music_player_gradio")
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, stereo: 417 byte frames of 1152 samples
+MP3_HEADER = b"\xff\xfb\x90\x00"
+MP3_FRAME_SIZE = 417
+MP3_SAMPLES_PER_FRAME = 1152
+SAMPLE_RATE = 44100
+
+
+def _name(rng, words=2):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).title()
+
+
+def mp3_audio(duration):
+    """Silent MP3 stream whose Xing header declares duration seconds."""
+    frames = max(1, int(duration * SAMPLE_RATE / MP3_SAMPLES_PER_FRAME))
+    xing = bytearray(MP3_FRAME_SIZE)
+    xing[:4] = MP3_HEADER
+    xing[36:48] = b"Xing" + struct.pack(">II", 1, frames)  # Flag 1: frame count present
+    silent = MP3_HEADER + bytes(MP3_FRAME_SIZE - 4)
+    return bytes(xing) + silent * 2
+
+
+def flac_header(duration):
+    """fLaC marker plus a STREAMINFO block (44.1 kHz, 16 bit stereo) of duration seconds."""
+    total_samples = int(duration * SAMPLE_RATE)
+    info = struct.pack(">HH", 4096, 4096) + bytes(6)  # Block sizes, unknown frame sizes
+    # 20 bits sample rate, 3 bits channels - 1, 5 bits bits per sample - 1, 36 bits total samples
+    packed = (SAMPLE_RATE << 44) | (1 << 41) | (15 << 36) | total_samples
+    info += packed.to_bytes(8, "big") + bytes(16)  # No MD5
+    return b"fLaC" + bytes([0x80]) + len(info).to_bytes(3, "big") + info
+
+
+def cover_jpeg(rng, size=300):
+    """A solid colour JPEG, or None without Pillow."""
+    if Image is None:
+        return None
+    buf = io.BytesIO()
+    Image.new("RGB", (size, size), tuple(rng.randrange(256) for _ in range(3))).save(buf, "JPEG", quality=80)
+    return buf.getvalue()
+
+
+def write_mp3(path, tags, duration, cover=None):
+    with open(path, "wb") as f:
+        f.write(mp3_audio(duration))
+    easy = EasyID3()
+    easy["title"] = tags["title"]
+    easy["artist"] = tags["artist"]
+    easy["album"] = tags["album"]
+    easy["genre"] = "; ".join(tags["genres"])
+    easy["date"] = str(tags["year"])
+    easy.save(path)
+    if cover:
+        # EasyID3 has no picture key; the APIC frame is added with plain ID3
+        id3 = ID3(path)
+        id3.add(APIC(encoding=3, mime="image/jpeg", type=3, desc="Cover", data=cover))
+        id3.save(path)
+
+
+def write_flac(path, tags, duration, cover=None):
+    with open(path, "wb") as f:
+        f.write(flac_header(duration))
+    audio = FLAC(path)
+    audio["title"] = tags["title"]
+    audio["artist"] = tags["artist"]
+    audio["album"] = tags["album"]
+    audio["genre"] = tags["genres"]
+    audio["date"] = str(tags["year"])
+    if cover:
+        picture = Picture()
+        picture.type = 3
+        picture.mime = "image/jpeg"
+        picture.data = cover
+        audio.add_picture(picture)
+    audio.save()
+
+
+def verify_tags(paths, sample=VERIFY_SAMPLE, seed=0):
+    """Read a sample of paths with the web player's get_tags; raise if title, artist, album or year is missing."""
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+    from tag_utils import get_tags
+    for path in random.Random(seed).sample(paths, min(sample, len(paths))):
+        missing = [key for key in ("title", "artist", "album", "year", "genres") if not get_tags(path).get(key)]
+        if missing:
+            raise ValueError(f"{path}: the player reads no {', '.join(missing)}")
+
+
+def generate_library(root, count, seed=0):
+    """Write count tracks below root; returns the list of written paths."""
+    rng = random.Random(seed)
+    paths = []
+    artist_no = 0
+    while len(paths) < count:
+        artist_no += 1
+        artist = f"{_name(rng)} {artist_no}"
+        artist_genres = rng.sample(GENRES, rng.randint(1, 3))
+        for album_no in range(rng.randint(*ALBUMS_PER_ARTIST)):
+            if len(paths) >= count:
+                break
+            year = rng.randint(1960, 2024)
+            album = f"{_name(rng, 3)} {album_no + 1}"
+            folder = os.path.join(root, artist, f"{album} ({year})")
+            os.makedirs(folder, exist_ok=True)
+            art = rng.random()
+            cover = cover_jpeg(rng) if art < FOLDER_COVER_SHARE + EMBEDDED_COVER_SHARE else None
+            if cover and art < FOLDER_COVER_SHARE:
+                with open(os.path.join(folder, "cover.jpg"), "wb") as f:
+                    f.write(cover)
+                cover = None
+            ext = ".flac" if rng.random() < FLAC_SHARE else ".mp3"
+            for track_no in range(1, rng.randint(*TRACKS_PER_ALBUM) + 1):
+                if len(paths) >= count:
+                    break
+                title = _name(rng, rng.randint(1, 4))
+                tags = {"title": title, "artist": artist, "album": album, "year": year,
+                        "genres": rng.sample(artist_genres, rng.randint(1, len(artist_genres)))}
+                path = os.path.join(folder, f"{track_no:02d} - {title}{ext}")
+                duration = rng.randint(*DURATION_RANGE)
+                (write_flac if ext == ".flac" else write_mp3)(path, tags, duration, cover)
+                paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", help="Directory to write the library into")
+    parser.add_argument("count", type=int, help="Number of tracks")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if Image is None:
+        print("[WARNING] Pillow not installed; the library is generated without cover art")
+    paths = generate_library(args.root, args.count, args.seed)
+    verify_tags(paths, seed=args.seed)
+    print(f"Wrote {len(paths)} tracks to {args.root}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import os
+import hashlib
+import threading
+
+# Content-addressed store for embedded cover art. Images are written once per
+# distinct picture (tracks of the same album share one file) and tag records
+# only keep the returned cover id, so tag caches stay small.
+
+
+class CoverStore:
+    """Cover images on disk, keyed by the SHA-1 of their bytes."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, cover_id):
+        return os.path.join(self.root, cover_id[:2], cover_id)
+
+    def put(self, data):
+        """Store image bytes (if not already present) and return their cover id."""
+        cover_id = hashlib.sha1(data).hexdigest()
+        path = self.path(cover_id)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a private temp file first; scanner workers may race here
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return cover_id
+
+    def get(self, cover_id):
+        """Return the image bytes for cover_id, or None if unknown."""
+        if not cover_id:
+            return None
+        try:
+            with open(self.path(cover_id), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def __contains__(self, cover_id):
+        return bool(cover_id) and os.path.exists(self.path(cover_id))
+
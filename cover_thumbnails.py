@@ -0,0 +1,136 @@
+import io
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+# Pre-sized cover renditions. Each album's art is decoded once, in a small
+# background pool, into fixed-size JPEGs kept on disk; players then only
+# open a small file instead of decoding a full-size cover on every track
+# change. The cache is capped in bytes and evicts least recently used
+# renditions (file mtime is refreshed on every hit). Keys name the source
+# image and its version, so a replaced or newly added cover gets a new key
+# instead of an outdated rendition or miss marker.
+
+THUMBNAIL_SIZES = (100, 300)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_WORKERS = 2
+JPEG_QUALITY = 85
+
+
+def source_key(path, *stamp):
+    """Thumbnail key of the image in path; stamp (e.g. mtime and size) changes whenever the image may have."""
+    return hashlib.sha1("\n".join(map(str, (path, *stamp))).encode("utf-8")).hexdigest()
+
+
+class ThumbnailCache:
+    """Disk cache of THUMBNAIL_SIZES renditions per key, built in a background pool."""
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES, workers=DEFAULT_WORKERS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnails")
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> Future, so one build serves every caller
+        self._total = None  # Bytes on disk, counted on the first write
+
+    def path(self, key, size):
+        return os.path.join(self.root, key[:2], f"{key}_{size}.jpg")
+
+    def _missing_marker(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.none")
+
+    def get(self, key, size):
+        """Path of a built rendition, or None. A hit counts as a use for the LRU."""
+        path = self.path(key, size)
+        try:
+            os.utime(path)
+            return path
+        except OSError:
+            return None
+
+    def has_no_image(self, key):
+        """True if a previous build found no artwork for key."""
+        return os.path.exists(self._missing_marker(key))
+
+    def submit(self, key, load_image):
+        """Build every rendition for key in the background; the Future yields True if there was art.
+
+        load_image() returns the source image bytes or None; it runs in the pool.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._build, key, load_image)
+                self._inflight[key] = future
+            return future
+
+    def _build(self, key, load_image):
+        try:
+            if all(self.get(key, size) for size in THUMBNAIL_SIZES):
+                return True
+            try:
+                data = load_image()
+                image = None
+                if data:
+                    image = Image.open(io.BytesIO(data))
+                    image.draft("RGB", (THUMBNAIL_SIZES[-1], THUMBNAIL_SIZES[-1]))  # JPEGs decode at reduced scale
+                    image = image.convert("RGB")
+            except Exception as e:
+                print(f"[WARNING] Could not read cover art: {e}")
+                image = None
+            os.makedirs(os.path.join(self.root, key[:2]), exist_ok=True)
+            if image is None:
+                # Remember the miss so artless albums are not re-read on every request
+                open(self._missing_marker(key), "wb").close()
+                return False
+            written = 0
+            for size in THUMBNAIL_SIZES:
+                thumb = image.copy()
+                thumb.thumbnail((size, size))
+                path = self.path(key, size)
+                tmp = f"{path}.{threading.get_ident()}.tmp"
+                thumb.save(tmp, "JPEG", quality=JPEG_QUALITY)
+                written += os.path.getsize(tmp)
+                os.replace(tmp, path)
+            self._account(written)
+            return True
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _account(self, written):
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._files())
+            else:
+                self._total += written
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _files(self):
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                # Miss markers are empty, but old ones are dropped along with old renditions
+                if name.endswith((".jpg", ".none")):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def _evict(self):
+        # Drop least recently used renditions until 90% of the cap is left
+        files = sorted(self._files(), key=lambda item: item[2])
+        self._total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        for path, size, _ in files:
+            if self._total <= target:
+                break
+            try:
+                os.remove(path)
+                self._total -= size
+            except OSError:
+                pass
@@ -0,0 +1,84 @@
+import threading
+
+# Inverted genre index: genre -> posting list of tracks. Built while scanning
+# and updated per track, so genre filters and counts are set unions over the
+# matching posting lists instead of a pass over the whole library.
+
+
+class GenreIndex:
+    """Posting lists of track ids per genre, safe to update from a scan thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._track_genres = {}
+
+    @classmethod
+    def build(cls, items):
+        """Create an index from (track, genres) pairs."""
+        index = cls()
+        for track, genres in items:
+            index.set(track, genres)
+        return index
+
+    def copy(self):
+        """Independent copy, to be updated off to the side."""
+        other = GenreIndex()
+        with self._lock:
+            other._postings = {g: set(tracks) for g, tracks in self._postings.items()}
+            other._track_genres = dict(self._track_genres)
+        return other
+
+    def set(self, track, genres):
+        """Add a track or replace its genres."""
+        genres = frozenset(genres)
+        with self._lock:
+            old = self._track_genres.get(track, frozenset())
+            for g in old - genres:
+                self._discard(g, track)
+            for g in genres - old:
+                self._postings.setdefault(g, set()).add(track)
+            self._track_genres[track] = genres
+
+    def remove(self, track):
+        with self._lock:
+            for g in self._track_genres.pop(track, ()):
+                self._discard(g, track)
+
+    def _discard(self, genre, track):
+        posting = self._postings.get(genre)
+        if posting is not None:
+            posting.discard(track)
+            if not posting:
+                del self._postings[genre]
+
+    def tracks(self, genres):
+        """Tracks having any of the given genres (a new set)."""
+        with self._lock:
+            postings = [self._postings[g] for g in set(genres) if g in self._postings]
+            if len(postings) == 1:
+                return set(postings[0])
+            return set().union(*postings)
+
+    def count(self, genres):
+        """Number of tracks having any of the given genres."""
+        genres = set(genres)
+        if len(genres) == 1:
+            with self._lock:
+                return len(self._postings.get(next(iter(genres)), ()))
+        return len(self.tracks(genres))
+
+    def genres(self):
+        """Genres that have at least one track."""
+        with self._lock:
+            return set(self._postings)
+
+    def genres_of(self, track):
+        with self._lock:
+            return self._track_genres.get(track, frozenset())
+
+    def __contains__(self, track):
+        return track in self._track_genres
+
+    def __len__(self):
+        return len(self._track_genres)
@@ -0,0 +1,304 @@
+import os
+import queue
+import threading
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Incremental library scanning shared by the desktop and Gradio players.
+# Each scanned file is remembered by a (mtime, size, inode) fingerprint so a
+# rescan only has to re-read tags for files that are new or have changed.
+
+AUDIO_EXTS = (".mp3", ".flac")
+DEFAULT_SCAN_WORKERS = os.cpu_count() or 4
+DEFAULT_CHUNK_SIZE = 32
+# Directory walking is I/O bound (network round trips), not CPU bound
+DEFAULT_WALK_WORKERS = 8
+WALK_BATCH_SIZE = 256
+
+def file_fingerprint(path, st=None):
+    """Return the (mtime_ns, size, inode) fingerprint of a file."""
+    if st is None:
+        st = os.stat(path)
+    # DirEntry.stat() on Windows reports no inode; keep both sources comparable
+    ino = st.st_ino if os.name != 'nt' else 0
+    return (st.st_mtime_ns, st.st_size, ino)
+
+
+def is_audio_file(name, exts=AUDIO_EXTS):
+    return _has_ext(name, {e.lower() for e in exts})
+
+
+def _has_ext(name, exts):
+    dot = name.rfind('.')
+    return dot != -1 and name[dot:].lower() in exts
+
+
+def _scan_dir(path, exts, subdirs, found, on_dir=None):
+    # One scandir round trip per directory; DirEntry caches the stat result
+    try:
+        # Taken before listing, so a change during the listing shows as a newer mtime
+        mtime_ns = os.stat(path).st_mtime_ns if on_dir is not None else None
+        it = os.scandir(path)
+    except OSError:
+        return
+    names, dir_names = [], []
+    with it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                    if on_dir is not None:
+                        dir_names.append(entry.name)
+                    continue
+                if _has_ext(entry.name, exts) and entry.is_file():
+                    found.append((entry.path, entry.stat()))
+                if on_dir is not None:
+                    names.append(entry.name)
+            except OSError:
+                continue
+    if on_dir is not None:
+        on_dir(path, mtime_ns, names, dir_names)
+
+
+def iter_audio_entries(folders, exts=AUDIO_EXTS, workers=DEFAULT_WALK_WORKERS, on_dir=None):
+    """Yield (path, stat_result) for every audio file below folders.
+
+    Top-level subdirectories are walked in parallel threads with os.scandir
+    and results are streamed out in batches as they are found, so consumers
+    can start work before the walk finishes. Order is not deterministic.
+    on_dir(path, mtime_ns, names, subdirs) is called from the walker threads
+    for every directory listed, with the names of its files and subdirectories.
+    """
+    exts = {e.lower() for e in exts}
+    results = queue.Queue(maxsize=64)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def walk(top):
+        try:
+            stack = [top]
+            found = []
+            while stack and not stop.is_set():
+                _scan_dir(stack.pop(), exts, stack, found, on_dir)
+                if len(found) >= WALK_BATCH_SIZE:
+                    put(found)
+                    found = []
+            if found:
+                put(found)
+        finally:
+            put(None)  # This subtree is done
+
+    subtrees = []
+    top_files = []
+    for folder in folders:
+        _scan_dir(folder, exts, subtrees, top_files, on_dir)
+    yield from top_files
+    if not subtrees:
+        return
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        for top in subtrees:
+            pool.submit(walk, top)
+        pending = len(subtrees)
+        while pending:
+            batch = results.get()
+            if batch is None:
+                pending -= 1
+            else:
+                yield from batch
+    finally:
+        stop.set()
+        pool.shutdown(wait=False)  # Workers notice the stop event and exit
+
+
+def iter_audio_files(folders, exts=AUDIO_EXTS, workers=DEFAULT_WALK_WORKERS):
+    """Yield the path of every audio file below folders (see iter_audio_entries)."""
+    for path, _ in iter_audio_entries(folders, exts, workers):
+        yield path
+
+
+class CancelToken:
+    """Cancellation flag of one scan; pass token.is_cancelled as should_stop."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def is_cancelled(self):
+        return self._event.is_set()
+
+
+class ScanResult:
+    """Outcome of an incremental scan: the new library plus what changed."""
+
+    def __init__(self, audio_files, tags_cache, fingerprints, added, changed, removed, cancelled=False):
+        self.audio_files = audio_files
+        self.tags_cache = tags_cache
+        self.fingerprints = fingerprints
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+        self.cancelled = cancelled
+
+    @property
+    def has_changes(self):
+        return bool(self.added or self.changed or self.removed)
+
+    def summary(self):
+        return f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed"
+
+
+def _read_tags_chunk(get_tags, paths):
+    # Runs inside the pool; one bad file must not sink the rest of its chunk
+    results = []
+    for path in paths:
+        try:
+            results.append((path, get_tags(path), None))
+        except Exception as e:
+            results.append((path, None, e))
+    return results
+
+
+def iter_tags(paths, get_tags, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, use_processes=False, should_stop=None):
+    """Read tags for paths in a worker pool, yielding (path, tags, error) in input order.
+
+    paths may be a lazy iterable; it is consumed in chunks of chunk_size with
+    at most two chunks per worker in flight. With use_processes the pool is a
+    ProcessPoolExecutor, so get_tags must be a picklable module-level function;
+    its workers are started with forkserver (spawn where that is missing),
+    never forked from the multi-threaded caller, where a child could inherit a
+    lock held by another thread and deadlock. workers <= 1 reads everything in
+    the calling thread.
+    """
+    workers = DEFAULT_SCAN_WORKERS if workers is None else workers
+    paths = iter(paths)
+    if workers <= 1:
+        for path in paths:
+            if should_stop is not None and should_stop():
+                return
+            yield _read_tags_chunk(get_tags, [path])[0]
+        return
+    if use_processes:
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method))
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+    with pool as executor:
+        in_flight = deque()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(in_flight) < workers * 2:
+                    chunk = list(itertools.islice(paths, chunk_size))
+                    if not chunk:
+                        exhausted = True
+                        break
+                    in_flight.append((chunk, executor.submit(_read_tags_chunk, get_tags, chunk)))
+                if not in_flight:
+                    break
+                chunk, future = in_flight.popleft()
+                try:
+                    results = future.result()
+                except Exception as e:
+                    # The worker itself died (e.g. a crashed child process)
+                    results = [(path, None, e) for path in chunk]
+                for result in results:
+                    yield result
+                if should_stop is not None and should_stop():
+                    break
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+
+
+def incremental_scan(audio_files, get_tags, tags_cache=None, fingerprints=None, should_stop=None, on_progress=None,
+                     on_tags=None, workers=1, use_processes=False, chunk_size=DEFAULT_CHUNK_SIZE,
+                     keep_unchanged=True):
+    """Build a library from audio_files, reusing cached tags for unchanged files.
+
+    audio_files is any iterable of paths, or of (path, stat_result) pairs as
+    produced by iter_audio_entries (which saves a stat per file), and may be
+    a lazy stream; get_tags is the frontend's tag reader. Files whose fingerprint matches the previous
+    scan keep their cached tags; new or changed files are re-parsed (in a pool
+    when workers > 1, see iter_tags) and files that disappeared are dropped.
+    on_tags(path, tags, fingerprint) is called for every freshly parsed file
+    as soon as it is read. With keep_unchanged=False the result's tags_cache
+    only holds the re-parsed files, so cached tags of unchanged files are
+    never loaded (useful when they live in a TrackStore); fingerprints then
+    also include cached files that had none yet.
+    The caller's mappings are never modified.
+    """
+    old_tags = tags_cache or {}
+    old_prints = fingerprints or {}
+    files = []
+    new_tags = {}
+    new_prints = {}
+    added, changed = [], []
+    pending_prints = {}
+    seen = set()
+    state = {"done": 0, "cancelled": False}
+
+    def stopped():
+        if should_stop is not None and should_stop():
+            state["cancelled"] = True
+        return state["cancelled"]
+
+    def progress(f):
+        state["done"] += 1
+        if on_progress is not None:
+            on_progress(state["done"], f)
+
+    def files_to_parse():
+        for item in audio_files:
+            if stopped():
+                return
+            f, st = item if isinstance(item, tuple) else (item, None)
+            if f in seen:
+                continue  # Overlapping folders (e.g. a parent and its subfolder)
+            try:
+                fp = file_fingerprint(f, st)
+            except OSError:
+                continue  # Vanished between listing and stat
+            seen.add(f)
+            files.append(f)
+            old_fp = old_prints.get(f)
+            # Caches written before fingerprints existed are trusted as-is once
+            if (old_fp is None or tuple(old_fp) == fp) and f in old_tags:
+                if keep_unchanged:
+                    new_tags[f] = old_tags[f]
+                if keep_unchanged or old_fp is None:
+                    new_prints[f] = fp
+                progress(f)
+                continue
+            if f in old_prints or f in old_tags:
+                changed.append(f)
+            else:
+                added.append(f)
+            pending_prints[f] = fp
+            yield f
+
+    for f, tags, error in iter_tags(files_to_parse(), get_tags, workers, chunk_size, use_processes, stopped):
+        fp = pending_prints.pop(f)
+        if error is None:
+            new_tags[f] = tags
+            new_prints[f] = fp
+            if on_tags is not None:
+                on_tags(f, tags, fp)
+        # On error the file stays listed and its tags are retried next scan
+        progress(f)
+    if state["cancelled"]:
+        removed = []
+    else:
+        removed = [f for f in set(old_prints) | set(old_tags) if f not in seen]
+    return ScanResult(files, new_tags, new_prints, added, changed, removed, state["cancelled"])
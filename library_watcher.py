@@ -0,0 +1,233 @@
+import os
+import time
+import threading
+from library_scan import AUDIO_EXTS, is_audio_file, iter_audio_entries
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# Live library updates shared by the desktop and Gradio players. With the
+# optional watchdog package, file system events (inotify, FSEvents, ...) are
+# collected; otherwise, or on network mounts where such events never arrive,
+# directories are polled by mtime. Either way changes are batched over a
+# short debounce window and reported as paths, so the players only re-read
+# the files that changed and never walk the whole tree again.
+#
+# The poller learns the tree from the scanner (pass record_dir as the
+# on_dir hook of iter_audio_entries) and costs one stat per directory per
+# round. A file rewritten in place does not change its directory's mtime,
+# so polling only notices added, removed and renamed files; the regular
+# rescan still catches retagged ones.
+
+DEFAULT_DEBOUNCE = 2.0
+MAX_DELAY = 30.0  # A batch is delivered after this long even if events keep coming
+DEFAULT_POLL_INTERVAL = 60.0
+
+
+class LibraryChanges:
+    """One debounced batch: changed (new or modified) and removed audio files, removed directories."""
+
+    def __init__(self):
+        self.changed = set()
+        self.removed = set()
+        self.removed_dirs = set()
+        self.added_dirs = set()
+
+    def __bool__(self):
+        return bool(self.changed or self.removed or self.removed_dirs or self.added_dirs)
+
+    def summary(self):
+        return f"{len(self.changed)} changed, {len(self.removed)} removed, {len(self.removed_dirs)} folders removed"
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        self.watcher._on_event(event)
+
+
+class LibraryWatcher:
+    """Report audio file changes below folders in debounced batches.
+
+    on_changes(changes) gets a LibraryChanges and runs on the watcher's own
+    thread; removed_dirs should be applied before changed. polling=None uses
+    watchdog when it is installed and falls back to polling otherwise.
+    """
+
+    def __init__(self, folders, on_changes, exts=AUDIO_EXTS, debounce=DEFAULT_DEBOUNCE,
+                 poll_interval=DEFAULT_POLL_INTERVAL, polling=None):
+        self.folders = [os.path.abspath(f) for f in folders]
+        self.on_changes = on_changes
+        self.exts = exts
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.polling = Observer is None if polling is None else polling
+        self._cond = threading.Condition()
+        self._pending = LibraryChanges()
+        self._first_event = self._last_event = 0.0
+        self._dirs = {}  # Polling: directory -> (mtime_ns, audio file names, subdirectory names)
+        self._observer = None
+        self._thread = None
+        self._stopped = False
+
+    def record_dir(self, path, mtime_ns, names, subdirs):
+        """Remember a directory listing (the scanner's on_dir hook) for the poller."""
+        audio = frozenset(n for n in names if is_audio_file(n, self.exts))
+        with self._cond:
+            self._dirs[path] = (mtime_ns, audio, frozenset(subdirs))
+
+    def start(self):
+        if not self.polling:
+            try:
+                self._observer = Observer()
+                for folder in self.folders:
+                    self._observer.schedule(_EventHandler(self), folder, recursive=True)
+                self._observer.start()
+            except Exception as e:
+                # e.g. the inotify watch limit; polling still works
+                print(f"[WARNING] File system events unavailable ({e}); polling the library instead")
+                self._observer = None
+                self.polling = True
+        self._thread = threading.Thread(target=self._run, name="library-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+
+    # --- Collecting changes ---
+
+    def _add(self, changed=(), removed=(), removed_dirs=(), added_dirs=()):
+        with self._cond:
+            now = time.monotonic()
+            if not self._pending:
+                self._first_event = now
+            self._last_event = now
+            self._pending.changed.update(changed)
+            self._pending.removed.update(removed)
+            self._pending.removed_dirs.update(removed_dirs)
+            self._pending.added_dirs.update(added_dirs)
+            self._cond.notify_all()
+
+    def _on_event(self, event):
+        # Called on watchdog's thread
+        kind = event.event_type
+        if kind in ("opened", "closed_no_write"):
+            return
+        src = os.fsdecode(event.src_path)
+        dest = os.fsdecode(getattr(event, "dest_path", "") or "")
+        if event.is_directory:
+            if kind == "deleted":
+                self._add(removed_dirs=[src])
+            elif kind == "created":
+                self._add(added_dirs=[src])
+            elif kind == "moved":
+                self._add(removed_dirs=[src], added_dirs=[dest] if self._inside(dest) else ())
+            return
+        if kind == "moved":
+            self._add(removed=[src] if is_audio_file(src, self.exts) else (),
+                      changed=[dest] if dest and is_audio_file(dest, self.exts) and self._inside(dest) else ())
+        elif is_audio_file(src, self.exts):
+            if kind == "deleted":
+                self._add(removed=[src])
+            else:
+                self._add(changed=[src])
+
+    def _inside(self, path):
+        return any(path == f or path.startswith(f.rstrip(os.sep) + os.sep) for f in self.folders)
+
+    def _poll(self):
+        with self._cond:
+            dirs = list(self._dirs.items())
+        for path, (mtime_ns, audio, subdirs) in dirs:
+            if self._stopped:
+                return
+            try:
+                current = os.stat(path).st_mtime_ns
+            except OSError:
+                if path in self._dirs:
+                    self._forget(path)
+                    self._add(removed_dirs=[path])
+                continue
+            if current == mtime_ns:
+                continue
+            self._relist(path, current, audio, subdirs)
+
+    def _relist(self, path, mtime_ns, audio, subdirs):
+        try:
+            with os.scandir(path) as it:
+                entries = [(e.name, e.is_dir(follow_symlinks=False)) for e in it]
+        except OSError:
+            return
+        new_subdirs = frozenset(name for name, is_dir in entries if is_dir)
+        new_audio = frozenset(name for name, is_dir in entries if not is_dir and is_audio_file(name, self.exts))
+        with self._cond:
+            self._dirs[path] = (mtime_ns, new_audio, new_subdirs)
+        for name in subdirs - new_subdirs:
+            self._forget(os.path.join(path, name))
+        self._add(changed=[os.path.join(path, n) for n in new_audio - audio],
+                  removed=[os.path.join(path, n) for n in audio - new_audio],
+                  removed_dirs=[os.path.join(path, n) for n in subdirs - new_subdirs],
+                  added_dirs=[os.path.join(path, n) for n in new_subdirs - subdirs])
+
+    def _forget(self, path):
+        prefix = path.rstrip(os.sep) + os.sep
+        with self._cond:
+            for d in [d for d in self._dirs if d == path or d.startswith(prefix)]:
+                del self._dirs[d]
+
+    # --- Delivering batches ---
+
+    def _due(self):
+        return min(self._last_event + self.debounce, self._first_event + MAX_DELAY)
+
+    def _run(self):
+        next_poll = time.monotonic() + self.poll_interval
+        while True:
+            with self._cond:
+                deadlines = [self._due()] if self._pending else []
+                if self.polling:
+                    deadlines.append(next_poll)
+                timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                if timeout is None or timeout > 0:
+                    self._cond.wait(timeout)
+                if self._stopped:
+                    return
+                batch = None
+                if self._pending and time.monotonic() >= self._due():
+                    batch, self._pending = self._pending, LibraryChanges()
+            if batch is not None:
+                self._deliver(batch)
+            if self.polling and time.monotonic() >= next_poll:
+                self._poll()
+                next_poll = time.monotonic() + self.poll_interval
+
+    def _deliver(self, batch):
+        # New directories are walked on their own; only their subtree is listed
+        if batch.added_dirs:
+            on_dir = self.record_dir if self.polling else None
+            for path, _ in iter_audio_entries(sorted(batch.added_dirs), self.exts, on_dir=on_dir):
+                batch.changed.add(path)
+        # Whatever happened in between, a path's last state is whether it exists now
+        for path in batch.changed | batch.removed:
+            if os.path.isfile(path):
+                batch.changed.add(path)
+                batch.removed.discard(path)
+            else:
+                batch.changed.discard(path)
+                batch.removed.add(path)
+        try:
+            self.on_changes(batch)
+        except Exception as e:
+            print(f"[WARNING] Library update failed: {e}")
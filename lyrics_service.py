@@ -0,0 +1,135 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Lyrics lookups shared by the desktop and Gradio players. Results are kept
+# on disk (one small JSON file per song, keyed by normalised artist/title),
+# misses are remembered for NEGATIVE_TTL so unknown songs are not asked for
+# on every play, and requests run on a small thread pool with one pooled
+# HTTP session. Concurrent requests for the same song share one fetch.
+
+LYRICS_API = "https://api.lyrics.ovh/v1/{artist}/{title}"
+NEGATIVE_TTL = 7 * 24 * 3600  # Retry songs without lyrics after a week
+DEFAULT_WORKERS = 4
+DEFAULT_TIMEOUT = 10
+
+
+def normalize_key(artist, title):
+    """Cache key for a song: case-folded, Unicode-normalised, single-spaced."""
+    def norm(s):
+        s = unicodedata.normalize("NFKC", s or "").casefold()
+        return re.sub(r"\s+", " ", s).strip()
+    return f"{norm(artist)}\n{norm(title)}"
+
+
+class LyricsService:
+    """Cached, pooled lyrics.ovh client; blocking, future and asyncio interfaces."""
+
+    def __init__(self, cache_dir, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, negative_ttl=NEGATIVE_TTL):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.negative_ttl = negative_ttl
+        self.session = requests.Session()
+        # Connection reuse plus retries with backoff instead of sleeping in a loop
+        retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lyrics")
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> Future, so one fetch serves every caller
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".json")
+
+    def cached(self, artist, title):
+        """Cached lyrics, "" for a song known to have none, or None if it must be fetched."""
+        try:
+            with open(self._path(normalize_key(artist, title)), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("lyrics"):
+            return entry["lyrics"]
+        if time.time() - entry.get("fetched_at", 0) < self.negative_ttl:
+            return ""
+        return None
+
+    def _store(self, key, artist, title, lyrics):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"artist": artist, "title": title, "lyrics": lyrics, "fetched_at": time.time()}, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[WARNING] Could not cache lyrics: {e}")
+
+    def _fetch(self, key, artist, title):
+        try:
+            cached = self.cached(artist, title)
+            if cached is not None:
+                return cached
+            try:
+                resp = self.session.get(LYRICS_API.format(artist=artist, title=title), timeout=self.timeout)
+            except requests.exceptions.RequestException:
+                return ""  # Network trouble is not cached; the next request tries again
+            if resp.status_code == 200:
+                try:
+                    lyrics = resp.json().get("lyrics", "") or ""
+                except ValueError:
+                    lyrics = ""
+            elif resp.status_code == 404:
+                lyrics = ""
+            else:
+                return ""
+            self._store(key, artist, title, lyrics)  # Misses are kept as negative entries
+            return lyrics
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def submit(self, artist, title):
+        """Return a Future for the song's lyrics ("" if none), sharing in-flight fetches."""
+        key = normalize_key(artist, title)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._fetch, key, artist, title)
+                self._inflight[key] = future
+            return future
+
+    def get(self, artist, title):
+        """Blocking lookup; answers from the disk cache without touching the pool."""
+        if not artist or not title:
+            return ""
+        cached = self.cached(artist, title)
+        if cached is not None:
+            return cached
+        return self.submit(artist, title).result()
+
+    async def get_async(self, artist, title):
+        """Like get, but awaits the fetch instead of blocking the event loop."""
+        if not artist or not title:
+            return ""
+        cached = self.cached(artist, title)
+        if cached is not None:
+            return cached
+        return await asyncio.wrap_future(self.submit(artist, title))
+
+    def prefetch(self, songs):
+        """Start fetching lyrics for (artist, title) pairs that are not cached yet."""
+        for artist, title in songs:
+            if artist and title and self.cached(artist, title) is None:
+                self.submit(artist, title)
@@ -1,5 +1,9 @@
 import os
+import queue
+import multiprocessing
 import random
+import threading
+import time
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from mutagen import File
@@ -7,31 +11,59 @@ from mutagen.flac import FLAC
 from mutagen.mp3 import MP3
 from PIL import Image, ImageTk
 import vlc
-import requests
-import io
-from persistence_utils import save_selected_folders, load_selected_folders, save_tags_cache, load_tags_cache
+from persistence_utils import (save_selected_folders, load_selected_folders, save_tags_cache, load_tags_cache,
+                               save_scan_fingerprints, load_scan_fingerprints, get_cover_store,
+                               get_lyrics_service, get_thumbnail_cache)
+from library_scan import incremental_scan, iter_audio_entries, iter_audio_files, file_fingerprint, DEFAULT_SCAN_WORKERS
+from library_watcher import LibraryWatcher
+from genre_index import GenreIndex
+from track_catalog import TrackCatalog
+from playlist_sampler import sample_by_artist
 
-# Helper to get all audio files recursively
+# Tag extraction for new/changed files is spread over a pool of workers.
+# Threads by default: process workers would re-import this GUI script (and
+# the frozen exe would start a new window per worker). True uses processes.
+SCAN_WORKERS = DEFAULT_SCAN_WORKERS
+SCAN_USE_PROCESSES = False
+# Cover art is shown from the 100px thumbnail rendition
+COVER_SIZE = 100
+# Lyrics for this many upcoming playlist entries are fetched in the background
+LYRICS_PREFETCH = 3
+# Without a library watcher the library is rescanned incrementally on this
+# timer, independent of playback. A watchdog-backed watcher reports every
+# change, so no timed rescans run while one is active; the polling fallback
+# only notices added, removed and renamed files, so a full rescan still runs
+# every POLLING_RESCAN_MS as the safety net for files retagged in place.
+LIBRARY_REFRESH_MS = 10 * 60 * 1000
+POLLING_RESCAN_MS = 6 * 60 * 60 * 1000
+# Scans run in a worker thread; the Tk loop drains its messages at this interval
+SCAN_POLL_MS = 100
+# Changes reported by the library watcher are applied on the Tk loop at this interval
+WATCH_POLL_MS = 500
+
+# Helper to get all audio files recursively (parallel scandir walk, see library_scan)
 def get_audio_files(folders, exts=(".mp3", ".flac")):
-    files = []
-    for folder in folders:
-        for root, _, filenames in os.walk(folder):
-            for f in filenames:
-                if f.lower().endswith(exts):
-                    files.append(os.path.join(root, f))
-    return files
+    return list(iter_audio_files(folders, exts))
 
 # Helper to extract tags
 import re
+# MP3 tags are ID3 frames; these hold the fields read under their common names
+ID3_FRAMES = {"title": "TIT2", "artist": "TPE1", "album": "TALB", "genre": "TCON"}
+# Stamped into every tags dict; cached MP3 tags from before ID3 frames were read are read again
+TAG_READER_VERSION = 2
 
 def get_tags(filepath):
     audio = File(filepath)
-    tags = {}
+    # Always has a duration (0 when unknown), so the cache upgrade below reads a file only once
+    tags = {'duration': 0, 'reader': TAG_READER_VERSION}
     if audio is None:
         return tags
+    id3 = isinstance(audio, MP3)
     # Common tags
     for tag in ["title", "artist", "album", "genre", "lyrics", "lyric"]:
-        v = audio.tags.get(tag) if audio.tags else None
+        v = audio.tags.get(ID3_FRAMES.get(tag, tag) if id3 else tag) if audio.tags else None
+        if hasattr(v, 'text'):
+            v = v.text  # ID3 text frame
         if v:
             tags[tag] = str(v[0]) if isinstance(v, list) else str(v)
     # Genre splitting
@@ -41,7 +73,7 @@ def get_tags(filepath):
         tags['genres'] = genres
     else:
         tags['genres'] = []
-    # Cover art
+    # Cover art: stored once per distinct image, the tags only keep its id
     cover = None
     if isinstance(audio, FLAC):
         if audio.pictures:
@@ -50,22 +82,13 @@ def get_tags(filepath):
         for k in audio.tags.keys():
             if k.startswith('APIC'):
                 cover = audio.tags[k].data
-    tags['cover'] = cover
+    tags['cover_id'] = get_cover_store().put(cover) if cover else None
+    # Captured here so playlists never have to open the file for its length
+    if hasattr(audio, 'info') and hasattr(audio.info, 'length'):
+        tags['duration'] = audio.info.length
     return tags
 
 # Fetch lyrics from internet
-LYRICS_API = "https://api.lyrics.ovh/v1/{artist}/{title}"
-def fetch_lyrics(artist, title):
-    try:
-        url = LYRICS_API.format(artist=artist, title=title)
-        resp = requests.get(url)
-        if resp.status_code == 200:
-            data = resp.json()
-            return data.get('lyrics', '')
-    except Exception:
-        pass
-    return ""
-
 class PlayerApp:
     CONFIG_FILE = ".music_player_config"
     FONT_FAMILY = "Segoe UI"
@@ -97,11 +120,50 @@ class PlayerApp:
         self.player = None
         self.genres = set()
         self.genre_vars = {}
+        self.panel_genres = set()  # Genres the checkbox panel was last built for
+        self.genre_cols = 0
+        self.genre_index = None  # Built by the first scan, then updated per changed file
+        self.catalog = None  # Display fields and durations per track, maintained like genre_index
         self.tags_cache = load_tags_cache()  # Caches tags by file path
+        # Tags cached before durations were recorded, or MP3 tags from before
+        # ID3 frames were read, are read once more; get_tags stores a duration
+        # of 0 for files it cannot parse
+        self.tags_cache = {f: tags for f, tags in self.tags_cache.items() if 'duration' in tags and (
+            tags.get('reader') == TAG_READER_VERSION or not f.lower().endswith('.mp3'))}
+        self.fingerprints = load_scan_fingerprints()  # (mtime, size, inode) per cached file
+        self.scan_queue = queue.Queue()  # (kind, generation, payload) from the scan worker
+        self.scan_thread = None
+        self.scan_cancel = threading.Event()
+        self.scan_generation = 0
+        self.last_scan_started = 0.0  # time.monotonic(), for scheduled_refresh
+        self.scan_callbacks = (None, None)
+        # Live updates between scans; each scan seeds a new watcher with its directory listing
+        self.watcher = None
+        self.scan_watcher = None
+        self.watch_queue = queue.Queue()  # (LibraryChanges, {path: (tags, fingerprint)})
         self.last_parent_folder = self.load_last_folder()  # Persist last selected parent folder
         self.setup_ui()
         self.update_folders_listbox()
+        # The cached library is usable right away; the scan below only applies changes
+        self.audio_files = list(self.tags_cache)
+        self.build_library_index()
+        self.refresh_library_views()
         self.scan_files()
+        self.root.after(LIBRARY_REFRESH_MS, self.scheduled_refresh)
+        self.root.after(WATCH_POLL_MS, self.poll_watch_queue)
+
+    def scheduled_refresh(self):
+        # Picks up added/removed/retagged files without touching playback
+        if self.watcher is None:
+            interval = LIBRARY_REFRESH_MS
+        elif self.watcher.polling:
+            interval = POLLING_RESCAN_MS
+        else:
+            interval = None  # Watchdog events cover everything; never walk the whole tree
+        due = interval is not None and time.monotonic() - self.last_scan_started >= interval / 1000
+        if self.folders and self.scan_thread is None and due:
+            self.scan_files()
+        self.root.after(LIBRARY_REFRESH_MS, self.scheduled_refresh)
 
     def update_song_count_by_genre(self):
         """
@@ -112,19 +174,10 @@ class PlayerApp:
         selected_genres = [g for g, v in self.genre_vars.items() if v.get()]
         if not selected_genres:
             count = len(self.audio_files)
-        else:
+        elif self.genre_index is None:
             count = 0
-            for f in self.audio_files:
-                try:
-                    tags = self.tags_cache.get(f)
-                    if tags is None:
-                        tags = get_tags(f)
-                        self.tags_cache[f] = tags
-                    genres = tags.get('genres', [])
-                    if any(g in selected_genres for g in genres):
-                        count += 1
-                except Exception:
-                    continue  # Skip invalid/corrupt files
+        else:
+            count = self.genre_index.count(selected_genres)
         self.song_count_label.config(text=f"Total songs: {count}")
 
 
@@ -199,6 +252,13 @@ class PlayerApp:
         remove_btn = tk.Button(folder_frame, text="Remove Selected", command=self.remove_selected_folders, bg=btn_bg,
                                fg=btn_fg, relief="raised", bd=3, activebackground=accent)
         remove_btn.grid(row=0, column=4, padx=2, pady=3)
+        # Background scan status, only shown while a scan runs
+        self.scan_status_label = tk.Label(folder_frame, text="", bg=bg_panel, fg=accent, font=self.font("small", "italic"))
+        self.scan_status_label.grid(row=0, column=5, padx=5, pady=3, sticky="w")
+        self.scan_cancel_btn = tk.Button(folder_frame, text="Cancel Scan", command=self.cancel_scan, bg=btn_bg, fg=btn_fg,
+                                         relief="raised", bd=2, activebackground=accent, font=self.font("small"))
+        self.scan_cancel_btn.grid(row=0, column=6, padx=2, pady=3)
+        self.scan_cancel_btn.grid_remove()
         # Move selected folders label, listbox, and scrollbar to row 1
         self.selected_folders_label = tk.Label(folder_frame, text="Selected Folders (0):", bg=bg_panel, fg=fg_label,
                  font=self.font("medium", "bold"))
@@ -415,156 +475,258 @@ class PlayerApp:
                 save_selected_folders(self.folders)
                 self.update_folders_listbox()
                 # --- Spinner and counter ---
-                spinner_win = tk.Toplevel(sel_win)
+                spinner_win = tk.Toplevel(self.root)  # Outlives the folder picker
                 spinner_win.title("Scanning Folders...")
                 tk.Label(spinner_win, text="Scanning and analyzing files, please wait...").pack(padx=10, pady=10)
                 from tkinter import ttk
                 spinner = ttk.Progressbar(spinner_win, mode="indeterminate", length=220)
                 spinner.pack(padx=10, pady=6)
-                counter_label = tk.Label(spinner_win, text="0 / 0")
+                counter_label = tk.Label(spinner_win, text="0 files")
                 counter_label.pack(pady=(0,10))
                 spinner.start(10)
-                spinner_win.update()
-                # Run scan_files with counter
-                def scan_with_counter():
-                    files = get_audio_files(self.folders)
-                    self.audio_files = files
-                    self.genres = set()
-                    tags_changed = False
-                    total = len(files)
-                    for i, f in enumerate(files):
-                        try:
-                            if f in self.tags_cache:
-                                tags = self.tags_cache[f]
-                            else:
-                                tags = get_tags(f)
-                                self.tags_cache[f] = tags
-                                tags_changed = True
-                            genres = tags.get('genres', [])
-                            for g in genres:
-                                self.genres.add(g)
-                        except Exception:
-                            continue
-                        if i % 10 == 0 or i == total-1:
-                            try:
-                                if counter_label.winfo_exists():
-                                    counter_label.config(text=f"{i+1} / {total}")
-                                    spinner_win.update()
-                            except tk.TclError:
-                                pass  # Widget was destroyed, ignore
-                    if tags_changed:
-                        save_tags_cache(self.tags_cache)
-                    # Update genre checkboxes
-                    for widget in self.genre_frame.winfo_children():
-                        widget.destroy()
-                    self.genre_vars = {}
-                    # Arrange genre checkboxes in a grid to fit the frame width
-                    def layout_genre_checkboxes():
-                        for widget in self.genre_frame.winfo_children():
-                            widget.destroy()
-                        self.genre_vars = {}
-                        avg_cb_width = 120  # Adjust as needed
-                        frame_width = self.genre_frame.winfo_width() or 600
-                        n_cols = max(1, frame_width // avg_cb_width)
-                        row, col = 0, 0
-                        for g in sorted(self.genres):
-                            var = tk.BooleanVar()
-                            cb = tk.Checkbutton(self.genre_frame, text=g, variable=var)
-                            cb.grid(row=row, column=col, sticky="w", padx=2, pady=2)
-                            self.genre_vars[g] = var
-                            col += 1
-                            if col >= n_cols:
-                                col = 0
-                                row += 1
-                    self.genre_frame.after(50, layout_genre_checkboxes)
-                    def on_resize(event):
-                        layout_genre_checkboxes()
-                    self.genre_frame.bind("<Configure>", on_resize)
-                    self.update_folders_listbox()
-                    spinner.stop()
-                    spinner_win.destroy()
-                self.root.after(100, scan_with_counter)
+                # The scan runs in the background; the window only reports on it
+                def on_progress(done):
+                    # Files stream in from the walker, so the total is not known up front
+                    if counter_label.winfo_exists():
+                        counter_label.config(text=f"{done} files")
+                def on_done(result):
+                    if spinner_win.winfo_exists():
+                        spinner.stop()
+                        spinner_win.destroy()
+                tk.Button(spinner_win, text="Cancel", command=self.cancel_scan).pack(pady=(0,10))
+                spinner_win.protocol("WM_DELETE_WINDOW", self.cancel_scan)
+                self.scan_files(on_progress=on_progress, on_done=on_done)
             sel_win.destroy()
         tk.Button(btn_frame, text="Add Selected", command=add_selected).pack(side="left", padx=5)
 
-    def scan_files(self):
-        self.audio_files = get_audio_files(self.folders)
-        # Update total song count label
-        if hasattr(self, 'song_count_label'):
-            self.update_song_count_by_genre()
-        # Gather genres, skip invalid/corrupt files
-        self.genres = set()
-        tags_changed = False
-        for f in self.audio_files:
-            try:
+    def apply_scan_result(self, result):
+        """Adopt the library from a finished incremental scan (already saved by the worker)."""
+        self.audio_files = result.audio_files
+        self.tags_cache = result.tags_cache
+        self.fingerprints = result.fingerprints
+        if self.genre_index is None:
+            self.build_library_index()
+        else:
+            for f in result.added + result.changed:
                 if f in self.tags_cache:
                     tags = self.tags_cache[f]
+                    self.genre_index.set(f, tags.get('genres', []))
+                    self.catalog.add(f, tags)
                 else:
-                    tags = get_tags(f)
-                    self.tags_cache[f] = tags
-                    tags_changed = True
-                genres = tags.get('genres', [])
-                for g in genres:
-                    self.genres.add(g)
-            except Exception:
+                    # Unreadable now; retried next scan
+                    self.genre_index.remove(f)
+                    self.catalog.remove(f)
+            for f in result.removed:
+                self.genre_index.remove(f)
+                self.catalog.remove(f)
+            self.genres = self.genre_index.genres()
+        if result.has_changes:
+            print(f"Library scan: {result.summary()}")
+
+    def build_library_index(self):
+        """Build the genre index and track catalog from the whole tags cache."""
+        self.genre_index = GenreIndex.build((f, tags.get('genres', [])) for f, tags in self.tags_cache.items())
+        self.catalog = TrackCatalog.build(self.tags_cache.items())
+        self.genres = self.genre_index.genres()
+
+    def scan_files(self, on_progress=None, on_done=None):
+        """Rescan the folders in a worker thread, replacing any scan still running.
+
+        Only new or changed files are re-read; unchanged ones keep their cached
+        tags. on_progress(done) and on_done(result) run on the Tk thread.
+        """
+        self.cancel_scan()
+        self.last_scan_started = time.monotonic()
+        # The watcher edits tags_cache and fingerprints on the Tk thread; it is
+        # off while scanning, and the scan reads its own copies of both dicts
+        self.stop_watcher()
+        self.scan_generation += 1
+        generation = self.scan_generation
+        cancel = self.scan_cancel = threading.Event()
+        self.scan_callbacks = (on_progress, on_done)
+        folders, tags_cache, fingerprints = list(self.folders), dict(self.tags_cache), dict(self.fingerprints)
+        watcher = self.scan_watcher = LibraryWatcher(folders, self.on_library_changes)
+
+        def progress(done, f):
+            if done % 100 == 0:
+                self.scan_queue.put(("progress", generation, done))
+
+        def worker():
+            # Never touches Tk; everything goes back through scan_queue
+            try:
+                entries = iter_audio_entries(folders, on_dir=watcher.record_dir)
+                result = incremental_scan(entries, get_tags, tags_cache, fingerprints,
+                                          should_stop=cancel.is_set, on_progress=progress, workers=SCAN_WORKERS,
+                                          use_processes=SCAN_USE_PROCESSES)
+                if result.has_changes and not cancel.is_set():
+                    save_tags_cache(result.tags_cache)
+                    save_scan_fingerprints(result.fingerprints)
+            except Exception as e:
+                self.scan_queue.put(("error", generation, e))
+                return
+            self.scan_queue.put(("done", generation, result))
+
+        polling = self.scan_thread is not None  # A replaced scan's poll loop carries on
+        self.scan_thread = threading.Thread(target=worker, daemon=True)
+        self.scan_thread.start()
+        self.set_scan_status("Scanning...")
+        if not polling:
+            self.root.after(SCAN_POLL_MS, self.poll_scan_queue)
+
+    def cancel_scan(self):
+        """Ask the running scan (if any) to stop; the library stays as it was."""
+        self.scan_cancel.set()
+
+    def set_scan_status(self, text):
+        self.scan_status_label.config(text=text)
+        if text and self.scan_thread is not None:
+            self.scan_cancel_btn.grid()
+        else:
+            self.scan_cancel_btn.grid_remove()
+
+    def poll_scan_queue(self):
+        # Runs on the Tk thread until the current scan reports back
+        on_progress, on_done = self.scan_callbacks
+        while True:
+            try:
+                kind, generation, payload = self.scan_queue.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.scan_generation:
+                continue  # From a scan that was replaced
+            if kind == "progress":
+                self.set_scan_status(f"Scanning... {payload} files")
+                if on_progress is not None:
+                    on_progress(payload)
                 continue
-        if tags_changed:
-            save_tags_cache(self.tags_cache)
-        # Update genre checkboxes
+            self.scan_thread = None
+            if kind == "error":
+                print(f"Library scan failed: {payload}")
+                self.set_scan_status("Scan failed.")
+            elif payload.cancelled:
+                self.set_scan_status("Scan cancelled.")
+            else:
+                self.apply_scan_result(payload)
+                self.refresh_library_views()
+                self.set_scan_status("")
+                self.start_watcher(self.scan_watcher)
+            if on_done is not None:
+                on_done(payload)
+            return
+        if self.scan_thread is not None:
+            self.root.after(SCAN_POLL_MS, self.poll_scan_queue)
+
+    def start_watcher(self, watcher):
+        """Replace the library watcher with one seeded by the scan that just finished."""
+        self.stop_watcher()
+        if watcher is not None and self.folders:
+            self.watcher = watcher.start()
+
+    def stop_watcher(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+    def on_library_changes(self, changes):
+        # Runs on the watcher thread: read the changed files here, apply them on the Tk thread
+        read = {}
+        for f in changes.changed:
+            try:
+                read[f] = (get_tags(f), file_fingerprint(f))
+            except Exception as e:
+                print(f"[WARNING] Could not read {f}: {e}")
+        self.watch_queue.put((changes, read))
+
+    def poll_watch_queue(self):
+        while True:
+            try:
+                changes, read = self.watch_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.apply_library_changes(changes, read)
+        self.root.after(WATCH_POLL_MS, self.poll_watch_queue)
+
+    def apply_library_changes(self, changes, read):
+        """Apply a watcher batch: only the files it lists are added, updated or dropped."""
+        if self.catalog is None or self.watcher is None:
+            return  # Folders were cleared meanwhile
+        removed = set(changes.removed)
+        for d in changes.removed_dirs:
+            prefix = d.rstrip(os.sep) + os.sep
+            removed.update(f for f in self.tags_cache if f.startswith(prefix))
+        removed.difference_update(read)
+        new = [f for f in read if f not in self.tags_cache]
+        for f in removed:
+            self.tags_cache.pop(f, None)
+            self.fingerprints.pop(f, None)
+            self.genre_index.remove(f)
+            self.catalog.remove(f)
+        for f, (tags, fingerprint) in read.items():
+            self.tags_cache[f] = tags
+            self.fingerprints[f] = fingerprint
+            self.genre_index.set(f, tags.get('genres', []))
+            self.catalog.add(f, tags)
+        if removed:
+            self.audio_files = [f for f in self.audio_files if f not in removed]
+        self.audio_files.extend(new)
+        self.genres = self.genre_index.genres()
+        self.refresh_library_views()
+        print(f"Library update: {changes.summary()}")
+        # Saved off the Tk thread, from copies so the live dicts can keep changing
+        tags_cache, fingerprints = dict(self.tags_cache), dict(self.fingerprints)
+        threading.Thread(target=lambda: (save_tags_cache(tags_cache), save_scan_fingerprints(fingerprints)),
+                         daemon=True).start()
+
+    def refresh_library_views(self):
+        """Update the song count, genre panel and folder list after a scan."""
+        self.update_genre_panel()
+        self.update_song_count_by_genre()
+        self.update_folders_listbox()
+
+    def update_genre_panel(self):
+        # Rebuilding hundreds of checkboxes is slow; only do it when the genre set changed
+        if self.genres == self.panel_genres:
+            return
+        self.panel_genres = set(self.genres)
+        self.genre_cols = 0
+        self.genre_frame.after(50, self.layout_genre_checkboxes)
+        # Re-layout on window resize
+        self.genre_frame.bind("<Configure>", lambda event: self.layout_genre_checkboxes(resized=True))
+
+    def layout_genre_checkboxes(self, resized=False):
+        """Arrange genre checkboxes in a grid to fit the frame width, keeping the selection."""
+        # Estimate checkbox width (in pixels)
+        avg_cb_width = 120  # Adjust as needed
+        frame_width = self.genre_frame.winfo_width() or 600
+        n_cols = max(1, frame_width // avg_cb_width)
+        if resized and n_cols == self.genre_cols:
+            return
+        self.genre_cols = n_cols
+        selected = {g for g, v in self.genre_vars.items() if v.get()}
         for widget in self.genre_frame.winfo_children():
             widget.destroy()
         self.genre_vars = {}
-        # Arrange genre checkboxes in a grid to fit the frame width
-        def layout_genre_checkboxes():
-            for widget in self.genre_frame.winfo_children():
-                widget.destroy()
-            self.genre_vars = {}
-            # Estimate checkbox width (in pixels)
-            avg_cb_width = 120  # Adjust as needed
-            frame_width = self.genre_frame.winfo_width() or 600
-            n_cols = max(1, frame_width // avg_cb_width)
-            row, col = 0, 0
-            for g in sorted(self.genres):
-                var = tk.BooleanVar()
-                def make_update_func():
-                    # Closure to capture genre name
-                    def update_count(*args):
-                        self.update_song_count_by_genre()
-                    return update_count
-                cb = tk.Checkbutton(self.genre_frame, text=g, variable=var, bg=self.genre_bg, activebackground=self.genre_bg, fg="#232323", selectcolor=self.genre_bg)
-                cb.grid(row=row, column=col, sticky="w", padx=2, pady=2)
-                var.trace_add('write', make_update_func())
-                self.genre_vars[g] = var
-                col += 1
-                if col >= n_cols:
-                    col = 0
-                    row += 1
-        self.genre_frame.after(50, layout_genre_checkboxes)
-        # Re-layout on window resize
-        def on_resize(event):
-            layout_genre_checkboxes()
-        self.genre_frame.bind("<Configure>", on_resize)
-        # Update folders listbox
-        self.update_folders_listbox()
+        row, col = 0, 0
+        for g in sorted(self.panel_genres):
+            var = tk.BooleanVar(value=g in selected)
+            cb = tk.Checkbutton(self.genre_frame, text=g, variable=var, bg=self.genre_bg, activebackground=self.genre_bg, fg="#232323", selectcolor=self.genre_bg)
+            cb.grid(row=row, column=col, sticky="w", padx=2, pady=2)
+            var.trace_add('write', lambda *args: self.update_song_count_by_genre())
+            self.genre_vars[g] = var
+            col += 1
+            if col >= n_cols:
+                col = 0
+                row += 1
+        if selected - self.panel_genres:
+            self.update_song_count_by_genre()  # A selected genre disappeared
 
     def pick_songs(self):
         selected_genres = [g for g, v in self.genre_vars.items() if v.get()]
         # If no genre is selected, allow all genres
-        if not selected_genres:
+        if not selected_genres or self.genre_index is None:
             filtered = list(self.audio_files)
         else:
-            filtered = []
-            for f in self.audio_files:
-                try:
-                    tags = self.tags_cache.get(f)
-                    if tags is None:
-                        tags = get_tags(f)
-                        self.tags_cache[f] = tags
-                    genres = tags.get('genres', [])
-                    if any(g in selected_genres for g in genres):
-                        filtered.append(f)
-                except Exception:
-                    continue
+            filtered = list(self.genre_index.tracks(selected_genres))
         n = int(self.num_entry.get() or 10)
         if len(filtered) < n:
             n = len(filtered)
@@ -573,97 +735,39 @@ class PlayerApp:
             messagebox.showinfo("Info", "No songs available for the current selection.")
             return
         # Enforce no artist >60% of playlist unless not enough alternatives
-        from collections import defaultdict
-        import math
-        # Build a mapping of artist to their songs
-        artist_to_files = defaultdict(list)
-        for f in filtered:
-            try:
-                tags = self.tags_cache.get(f) or get_tags(f)
-                artist = tags.get('artist', '').strip() or 'Unknown Artist'
-                artist_to_files[artist].append(f)
-            except Exception:
-                continue
-        max_per_artist = max(1, int(math.ceil(0.6 * n)))
-        playlist = []
-        used = set()
-        # First, try to fairly distribute songs
-        # Shuffle artist order for fairness
-        import random
-        artists = list(artist_to_files.keys())
-        random.shuffle(artists)
-        # Add up to max_per_artist per artist, round-robin
-        while len(playlist) < n:
-            added_any = False
-            for artist in artists:
-                songs = [f for f in artist_to_files[artist] if f not in used]
-                if not songs:
-                    continue
-                if playlist.count(artist) >= max_per_artist:
-                    continue
-                song = random.choice(songs)
-                playlist.append(song)
-                used.add(song)
-                added_any = True
-                # Count how many for this artist
-                if playlist.count(song) >= max_per_artist:
-                    break
-                if len(playlist) >= n:
-                    break
-            if not added_any:
-                break
-        # If still not enough, fill up with any remaining songs
-        if len(playlist) < n:
-            leftovers = [f for f in filtered if f not in used]
-            random.shuffle(leftovers)
-            playlist.extend(leftovers[:n-len(playlist)])
-        self.playlist = playlist[:n]
-        self.playlist_box.delete(0, tk.END)
-        for i, f in enumerate(self.playlist):
-            try:
-                tags = get_tags(f)
-                title = tags.get('title') or os.path.basename(f)
-                artist = tags.get('artist') or ''
-                display = f"{i+1}. {title}"
-                if artist:
-                    display += f" - {artist}"
-                self.playlist_box.insert(tk.END, display)
-            except Exception:
-                continue
+        ids = [i for i in map(self.catalog.id_of, filtered) if i is not None]
+        self.playlist = self.catalog.paths_of(sample_by_artist(self.catalog.group_by_artist(ids), n))
+        self.render_playlist()
         self.current = 0
-        # Calculate total duration in minutes
+        if self.playlist:
+            self.show_song(0)
+
+    def render_playlist(self):
+        """Fill the playlist box and total duration from the catalog, without opening any file."""
+        rows = []
         total_seconds = 0.0
-        for f in self.playlist:
-            try:
-                tags = get_tags(f)
-                # Try to get duration from tags
-                audio = File(f)
-                if hasattr(audio, 'info') and hasattr(audio.info, 'length'):
-                    total_seconds += audio.info.length
-            except Exception:
-                continue
+        for i, f in enumerate(self.playlist):
+            track_id = self.catalog.id_of(f) if self.catalog is not None else None
+            if track_id is None:
+                title, artist, duration = os.path.basename(f), '', 0
+            else:
+                title, artist, _, _, duration = self.catalog.fields(track_id)
+            display = f"{i+1}. {title}"
+            if artist:
+                display += f" - {artist}"
+            rows.append(display)
+            total_seconds += duration
+        self.playlist_box.delete(0, tk.END)
+        if rows:
+            self.playlist_box.insert(tk.END, *rows)
         total_minutes = int(total_seconds // 60)
         self.duration_label.config(text=f"Total duration: {total_minutes} min")
-        if self.playlist:
-            self.show_song(0)
 
     def shuffle_playlist(self):
-        import random
         if not self.playlist:
             return
         random.shuffle(self.playlist)
-        self.playlist_box.delete(0, tk.END)
-        for i, f in enumerate(self.playlist):
-            try:
-                tags = get_tags(f)
-                title = tags.get('title') or os.path.basename(f)
-                artist = tags.get('artist') or ''
-                display = f"{i+1}. {title}"
-                if artist:
-                    display += f" - {artist}"
-                self.playlist_box.insert(tk.END, display)
-            except Exception:
-                continue
+        self.render_playlist()
         self.current = 0
         if self.playlist:
             self.show_song(0)
@@ -685,43 +789,16 @@ class PlayerApp:
                 self.tags_cache[f] = tags
         except Exception:
             tags = {}
-        # Cover
-        cover = tags.get('cover')
-        if cover:
-            try:
-                image = Image.open(io.BytesIO(cover))
-                image = image.resize((100,100))
-                img = ImageTk.PhotoImage(image)
-                self.cover_label.config(image=img)
-                self.cover_label.image = img
-            except Exception:
-                self.cover_label.config(image='')
-                self.cover_label.image = None
+        # Cover: a pre-sized 100px rendition, built in the background on first use
+        cover_id = tags.get('cover_id')
+        thumb = get_thumbnail_cache().get(cover_id, COVER_SIZE) if cover_id else None
+        if thumb:
+            self.show_cover(thumb)
         else:
-            # Draw a music note as fallback
-            from PIL import ImageDraw, ImageFont
-            img = Image.new('RGBA', (100, 100), (50, 54, 58, 255))
-            draw = ImageDraw.Draw(img)
-            # Try to use a system font with a music note
-            try:
-                font = ImageFont.truetype("seguisym.ttf", 72)
-                note = "\u266B"
-            except Exception:
-                font = ImageFont.load_default()
-                note = "♪"
-            # Compute text size robustly for Pillow versions
-            try:
-                bbox = draw.textbbox((0, 0), note, font=font)
-                w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
-            except Exception:
-                try:
-                    w, h = draw.textsize(note, font=font)
-                except Exception:
-                    w, h = font.getmask(note).size
-            draw.text(((100-w)//2, (100-h)//2), note, font=font, fill=(184, 193, 236, 255))
-            img_tk = ImageTk.PhotoImage(img)
-            self.cover_label.config(image=img_tk)
-            self.cover_label.image = img_tk
+            self.show_cover_placeholder()
+            if cover_id and not get_thumbnail_cache().has_no_image(cover_id):
+                future = get_thumbnail_cache().submit(cover_id, lambda: get_cover_store().get(cover_id))
+                self.wait_for_cover(f, cover_id, future)
         # Song title under image
         # Always set a title even if tags are empty
         title = tags.get('title') or os.path.basename(f) or 'Unknown Title'
@@ -747,10 +824,81 @@ class PlayerApp:
         self.progress_var.set(0)
         self.progress_bar['value'] = 0
         self.song_time_label.config(text="")
-        # Lyrics
+        # Lyrics: embedded ones right away, otherwise fetched without blocking the UI
         lyrics = tags.get('lyrics') or tags.get('lyric')
-        if not lyrics:
-            lyrics = fetch_lyrics(tags.get('artist', ''), tags.get('title', ''))
+        if not lyrics and tags.get('artist') and tags.get('title'):
+            lyrics = get_lyrics_service().cached(tags['artist'], tags['title'])
+            if lyrics is None:
+                self.set_lyrics("Loading lyrics...")
+                self.wait_for_lyrics(f, get_lyrics_service().submit(tags['artist'], tags['title']))
+        else:
+            lyrics = lyrics or ""
+        if lyrics is not None:
+            self.set_lyrics(lyrics)
+        self.prefetch_lyrics(idx + 1)
+
+    def show_cover(self, path):
+        try:
+            img = ImageTk.PhotoImage(Image.open(path))
+            self.cover_label.config(image=img)
+            self.cover_label.image = img
+        except Exception:
+            self.show_cover_placeholder()
+
+    def wait_for_cover(self, f, cover_id, future):
+        # Polled from the Tk loop like lyrics; ignored if another song is showing by then
+        if not future.done():
+            self.root.after(100, self.wait_for_cover, f, cover_id, future)
+            return
+        if self.playlist and self.playlist[self.current] == f:
+            thumb = get_thumbnail_cache().get(cover_id, COVER_SIZE)
+            if thumb:
+                self.show_cover(thumb)
+
+    def show_cover_placeholder(self):
+        # Draw a music note as fallback
+        from PIL import ImageDraw, ImageFont
+        img = Image.new('RGBA', (100, 100), (50, 54, 58, 255))
+        draw = ImageDraw.Draw(img)
+        # Try to use a system font with a music note
+        try:
+            font = ImageFont.truetype("seguisym.ttf", 72)
+            note = "\u266B"
+        except Exception:
+            font = ImageFont.load_default()
+            note = "♪"
+        # Compute text size robustly for Pillow versions
+        try:
+            bbox = draw.textbbox((0, 0), note, font=font)
+            w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
+        except Exception:
+            try:
+                w, h = draw.textsize(note, font=font)
+            except Exception:
+                w, h = font.getmask(note).size
+        draw.text(((100-w)//2, (100-h)//2), note, font=font, fill=(184, 193, 236, 255))
+        img_tk = ImageTk.PhotoImage(img)
+        self.cover_label.config(image=img_tk)
+        self.cover_label.image = img_tk
+
+    def wait_for_lyrics(self, f, future):
+        # Polled from the Tk loop; the result is dropped if another song is showing by then
+        if not future.done():
+            self.root.after(100, self.wait_for_lyrics, f, future)
+            return
+        if self.playlist and self.playlist[self.current] == f:
+            self.set_lyrics(future.result())
+
+    def prefetch_lyrics(self, start):
+        """Fetch lyrics for the next LYRICS_PREFETCH playlist entries in the background."""
+        songs = []
+        for f in self.playlist[start:start + LYRICS_PREFETCH]:
+            tags = self.tags_cache.get(f) or {}
+            if not (tags.get('lyrics') or tags.get('lyric')):
+                songs.append((tags.get('artist'), tags.get('title')))
+        get_lyrics_service().prefetch(songs)
+
+    def set_lyrics(self, lyrics):
         self.lyrics_text.delete(1.0, tk.END)
         # Normalize double linefeeds to single
         if lyrics:
@@ -808,6 +956,8 @@ class PlayerApp:
         self.play()
 
     def clear_folders(self):
+        self.cancel_scan()
+        self.stop_watcher()
         self.folders = []
         save_selected_folders(self.folders)
         self.audio_files = []
@@ -815,9 +965,13 @@ class PlayerApp:
             self.song_count_label.config(text=f"Total songs: 0")
         self.genres = set()
         self.genre_vars = {}
+        self.panel_genres = set()
+        self.genre_index = None
+        self.catalog = None
         self.tags_cache = {}
-        from persistence_utils import save_tags_cache
+        self.fingerprints = {}
         save_tags_cache(self.tags_cache)
+        save_scan_fingerprints(self.fingerprints)
         self.update_folders_listbox()
         for widget in self.genre_frame.winfo_children():
             widget.destroy()
@@ -958,6 +1112,8 @@ class PlayerApp:
 
 
 if __name__ == "__main__":
+    # Lets scan worker processes of the frozen exe run their task instead of the GUI
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = PlayerApp(root)
     root.mainloop()
@@ -0,0 +1,108 @@
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi.responses import Response, StreamingResponse
+
+# File responses for the audio endpoints: byte ranges (206) so seeking only
+# fetches what it needs, plus ETag/Last-Modified validators and cacheable
+# Cache-Control so repeat plays come from the browser cache.
+
+CHUNK_SIZE = 256 * 1024
+# Track URLs carry the file's fingerprint, so a URL never changes content
+IMMUTABLE = "public, max-age=31536000, immutable"
+_RANGE = re.compile(r"bytes=\s*(\d*)-(\d*)")
+
+
+MEDIA_TYPES = {".mp3": "audio/mpeg", ".flac": "audio/flac"}
+
+
+def audio_media_type(path):
+    return MEDIA_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+
+
+def file_etag(st):
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def parse_range(header, size):
+    """Inclusive (start, end) of a single "bytes=" range, or None to send the whole file.
+
+    Raises ValueError if the range cannot be satisfied. Multiple ranges and
+    other units are ignored (answered with the whole file), as HTTP allows.
+    """
+    match = _RANGE.fullmatch(header.strip()) if header else None
+    if match is None or not any(match.groups()):
+        return None  # Absent or malformed; serve the whole file
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and end < start:
+            return None
+    else:
+        suffix = int(last)  # bytes=-N: the last N bytes
+        if suffix == 0:
+            raise ValueError("empty suffix range")
+        start, end = max(0, size - suffix), size - 1
+    if start >= size:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+
+def iter_file(path, start, length, chunk_size=CHUNK_SIZE):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _not_modified(request, etag, mtime):
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return inm.strip() == "*" or etag in (t.strip() for t in inm.split(","))
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            pass
+    return False
+
+
+def file_response(request, path, media_type, cache_control=IMMUTABLE):
+    """Serve path honouring Range, If-Range, If-None-Match and If-Modified-Since (GET or HEAD)."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return Response(status_code=404)
+    size = st.st_size
+    etag = file_etag(st)
+    last_modified = formatdate(st.st_mtime, usegmt=True)
+    headers = {"ETag": etag, "Last-Modified": last_modified, "Cache-Control": cache_control,
+               "Accept-Ranges": "bytes"}
+    if _not_modified(request, etag, st.st_mtime):
+        return Response(status_code=304, headers=headers)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and if_range and if_range.strip() not in (etag, last_modified):
+        range_header = None  # The client's partial copy is outdated; send it all
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    status = 200
+    start, length = 0, size
+    if byte_range is not None:
+        start, end = byte_range
+        length = end - start + 1
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+    if request.method == "HEAD":
+        return Response(status_code=status, headers=headers, media_type=media_type)
+    return StreamingResponse(iter_file(path, start, length), status_code=status, headers=headers,
+                             media_type=media_type)
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Worker pools for the blocking parts of async endpoints (tag reads, SQLite,
+# cover lookups, sampling the library), so a slow disk or NFS read never
+# stalls the event loop. Each pool only accepts max_pending jobs (queued or
+# running); beyond that submit raises ExecutorBusy, which the app answers
+# with 503 instead of letting requests pile up behind a stuck mount.
+
+
+class ExecutorBusy(Exception):
+    """The executor already has max_pending jobs queued or running."""
+
+    def __init__(self, name):
+        super().__init__(f"{name} executor is busy")
+        self.name = name
+
+
+class BoundedExecutor:
+    """Thread pool with a bounded number of queued plus running jobs."""
+
+    def __init__(self, name, workers, max_pending):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max(workers, max_pending)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise ExecutorBusy(self.name)
+            self._pending += 1
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._done(None)
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, _):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn in the pool and await its result; raises ExecutorBusy when full."""
+        # A cancelled await (client gone) leaves the job running; its slot frees when it ends
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self):
+        return {"workers": self.workers, "max_pending": self.max_pending, "pending": self._pending,
+                "rejected": self.rejected}
@@ -0,0 +1,55 @@
+import os
+import threading
+
+# Folder cover lookups (cover.jpg, folder.png, ...) memoized per directory.
+# The scanner records every directory it lists, so a lookup costs one stat
+# of the directory; it is only re-listed when the directory's mtime has
+# changed, which is what adding, removing or renaming a cover does (the
+# library watcher only reports audio files, so this is how covers added
+# between scans are found).
+
+COVER_NAMES = ("cover.jpg", "cover.png", "folder.jpg", "folder.png")
+
+
+class FolderCoverCache:
+    """Cover file per directory, keyed by directory and revalidated by its mtime."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._covers = {}  # folder -> (mtime_ns, cover path or None)
+
+    def record(self, folder, mtime_ns, names, subdirs=()):
+        """Remember folder's cover from a listing of its file names (scanner hook); returns it."""
+        names = set(names)
+        cover = next((os.path.join(folder, name) for name in COVER_NAMES if name in names), None)
+        with self._lock:
+            self._covers[folder] = (mtime_ns, cover)
+        return cover
+
+    def get(self, filepath):
+        """Cover path for a track, or None; one stat of its folder unless that changed."""
+        return self.refresh(os.path.dirname(filepath))
+
+    def refresh(self, folder):
+        """Re-list folder if its mtime changed since it was recorded; returns its cover path."""
+        try:
+            mtime_ns = os.stat(folder).st_mtime_ns
+        except OSError:
+            with self._lock:
+                self._covers.pop(folder, None)
+            return None
+        entry = self._covers.get(folder)
+        if entry is not None and entry[0] == mtime_ns:
+            return entry[1]
+        try:
+            names = [e.name for e in os.scandir(folder) if e.is_file()]
+        except OSError:
+            names = []
+        return self.record(folder, mtime_ns, names)
+
+    def clear(self):
+        with self._lock:
+            self._covers.clear()
+
+    def __len__(self):
+        return len(self._covers)
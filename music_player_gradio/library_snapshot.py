@@ -0,0 +1,41 @@
+import itertools
+
+from track_catalog import TrackCatalog
+from genre_index import GenreIndex
+
+# The scanned library as one immutable value. Scans and live updates copy
+# the current snapshot's catalog and genre index, change the copies off to
+# the side and publish a new snapshot with a single reference assignment,
+# so request handlers never block and never see a half-applied scan. Read
+# player.library once per request and use that snapshot throughout.
+
+# Every snapshot gets the next version; caches keyed by it (playlist rows,
+# ETags) go stale as soon as a newer library is published
+_library_versions = itertools.count(1)
+
+
+class LibrarySnapshot:
+    """Catalog, genre index, file list and genre names of one library state.
+
+    Nothing in a published snapshot may be changed; make a new one instead.
+    """
+
+    __slots__ = ("catalog", "genre_index", "audio_files", "genres", "version")
+
+    def __init__(self, catalog=None, genre_index=None, audio_files=None):
+        catalog = catalog if catalog is not None else TrackCatalog()
+        genre_index = genre_index if genre_index is not None else GenreIndex()
+        object.__setattr__(self, "catalog", catalog)
+        object.__setattr__(self, "genre_index", genre_index)  # Keyed by catalog id
+        object.__setattr__(self, "audio_files", list(audio_files or ()))
+        object.__setattr__(self, "genres", frozenset(genre_index.genres()))
+        object.__setattr__(self, "version", next(_library_versions))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("LibrarySnapshot is immutable; publish a new one")
+
+    def __len__(self):
+        return len(self.audio_files)
+
+
+EMPTY_LIBRARY = LibrarySnapshot()
@@ -1,13 +1,16 @@
 # Gradio-based Music Player (browser UI)
 # Ported from tkinter version
 import os
+import sys
 import random
+import asyncio
+import itertools
+import hashlib
 import time
 import gradio as gr
 from mutagen import File
 from mutagen.flac import FLAC
 from mutagen.mp3 import MP3
-import requests
 import re
 
 # --- OpenRouter Chat integration ---
@@ -31,107 +34,53 @@ import mimetypes
 
 # --- End Hybrid API imports ---
 
-# Helper to get all audio files recursively
+# Library scanning modules shared with the desktop player live in the repo root
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+from library_scan import incremental_scan, iter_audio_entries, iter_audio_files, iter_tags, file_fingerprint, CancelToken, DEFAULT_SCAN_WORKERS
+from library_watcher import LibraryWatcher
+from track_store import TrackStore, StoredTagsCache
+from genre_index import GenreIndex
+from track_catalog import TrackCatalog
+from library_snapshot import LibrarySnapshot, EMPTY_LIBRARY
+from playlist_sampler import sample_by_artist, fit_duration, DEFAULT_DURATION_TOLERANCE
+from tag_utils import get_tags, read_embedded_cover, TAG_READER_VERSION
+from lyrics_service import LyricsService
+from cover_thumbnails import ThumbnailCache, source_key, THUMBNAIL_SIZES
+from folder_covers import FolderCoverCache
+from playlist_events import PlaylistEvents
+from sessions import SessionStore, SESSION_COOKIE, DEFAULT_MAX_SESSIONS, DEFAULT_IDLE_SECONDS
+from audio_http import file_response, audio_media_type, IMMUTABLE
+from transcoder import Transcoder, TranscodeError, TranscoderBusy, FORMATS, DEFAULT_BITRATE, clamp_bitrate
+from executors import BoundedExecutor, ExecutorBusy
+from request_metrics import RequestMetrics, LatencyMiddleware
+
+# Helper to get all audio files recursively (parallel scandir walk, see library_scan)
 def get_audio_files(folders, exts=(".mp3", ".flac")):
-    files = []
-    for folder in folders:
-        for root, _, filenames in os.walk(folder):
-            for f in filenames:
-                if f.lower().endswith(exts):
-                    files.append(os.path.join(root, f))
-    return files
-
-def get_tags(filepath):
-    try:
-        audio = File(filepath)
-    except Exception as e:
-        # print(f"Error reading file: {e}")
-        return {'genres': []}
-    tags = {}
-    if audio is None or not hasattr(audio, 'tags') or audio.tags is None:
-        tags['genres'] = []
-        return tags
-    all_keys = list(audio.tags.keys()) if hasattr(audio.tags, 'keys') else []
-    genres = []
-    # Look for 'genre', 'GENRE', and 'TCON' (case-insensitive)
-    for key in all_keys:
-        if key.lower() in ('genre', 'tcon'):
-            val = audio.tags[key]
-            # Handle both list and string
-            if isinstance(val, list):
-                for v in val:
-                    genres.extend([g.strip() for g in re.split(r'[;|,/\\>\-]+', str(v)) if g.strip()])
-            else:
-                genres.extend([g.strip() for g in re.split(r'[;|,/\\>\-]+', str(val)) if g.strip()])
-    tags['genres'] = genres
-    if genres:
-        tags['genre'] = genres[0]
-    # Get other tags
-    for tag in ["title", "artist", "album", "lyrics", "lyric"]:
-        for key in all_keys:
-            if key.lower() == tag:
-                v = audio.tags[key]
-                tags[tag] = str(v[0]) if isinstance(v, list) else str(v)
-    tags['cover'] = None  # Skipping cover art for now
-
-    # Add duration and year metadata
-    try:
-        if hasattr(audio, 'info') and hasattr(audio.info, 'length'):
-            tags['duration'] = int(audio.info.length)
-        for key in all_keys:
-            if key.lower() in ('date', 'year'):
-                val = audio.tags[key]
-                year_str = val[0] if isinstance(val, list) else val
-                try:
-                    # Try to extract a valid year from the string
-                    year_value = int(str(year_str)[:4])
-                    # Only use years that make sense (roughly 1900-2100)
-                    if 1900 <= year_value <= 2100:
-                        tags['year'] = year_value
-                except (ValueError, TypeError):
-                    # If we can't parse the year, don't set it
-                    pass
-                break
-                
-    except Exception:
-        pass
+    return list(iter_audio_files(folders, exts))
+
+# Lyrics for this many upcoming playlist entries are fetched in the background
+LYRICS_PREFETCH = 3
 
-    return tags
+# Executor sizes for the async endpoints: I/O waits on disks and SQLite, CPU
+# work (sampling) is held to a few threads so it cannot crowd out the I/O
+IO_WORKERS, IO_MAX_PENDING = 8, 64
+CPU_WORKERS, CPU_MAX_PENDING = 2, 16
 
-LYRICS_API = "https://api.lyrics.ovh/v1/{artist}/{title}"
 def fetch_lyrics(artist, title):
-    max_retries = 2
-    retry_delay = 1  # seconds
-    
-    for attempt in range(max_retries):
-        try:
-            url = LYRICS_API.format(artist=artist, title=title)
-            # Add timeout to prevent hanging connections
-            resp = requests.get(url, timeout=10)
-            
-            if resp.status_code == 200:
-                data = resp.json()
-                return data.get('lyrics', '')
-            elif resp.status_code >= 400:
-                # Don't retry for client/server errors
-                break
-                
-        except requests.exceptions.ConnectionError:
-            # Handle connection reset errors
-            if attempt < max_retries - 1:
-                # Wait before retrying
-                time.sleep(retry_delay)
-                continue
-        except requests.exceptions.Timeout:
-            # Handle timeouts
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-                continue
-        except Exception:
-            # Handle any other exceptions
-            break
-    
-    return ""  # Return empty string if all attempts fail
+    # Disk-cached with negative entries, pooled session and retries (see lyrics_service)
+    return lyrics_service.get(artist, title)
+
+def prefetch_lyrics(start, session=None):
+    """Fetch lyrics for the next LYRICS_PREFETCH playlist entries in the background."""
+    session = session or player
+    songs = []
+    for f in session.playlist[start:start + LYRICS_PREFETCH]:
+        tags = player.tags_cache.get(f) or {}
+        if not (tags.get('lyrics') or tags.get('lyric')):
+            songs.append((tags.get('artist'), tags.get('title')))
+    lyrics_service.prefetch(songs)
 
 # --- Gradio App Logic ---
 
@@ -157,11 +106,12 @@ def auto_populate_playlist():
 
 threading.Timer(0.5, auto_populate_playlist).start()
 
-def pick_songs(n, genres=None, should_autoplay=False):
+def pick_songs(n, genres=None, should_autoplay=False, session=None):
     """Pick random songs from the library with optional genre filtering.
     Optimized version to prevent CPU spikes and browser hanging.
+    The playlist of session (default: the shared player) is replaced.
     """
-    import random
+    session = session or player
     
     # Validate input count
     try:
@@ -171,190 +121,212 @@ def pick_songs(n, genres=None, should_autoplay=False):
     
     # Set autoplay flag if requested - do this early in case of any failures
     if should_autoplay:
-        player.autoplay_next = True
+        session.autoplay_next = True
+    
+    # One snapshot throughout, even if a scan publishes a new one meanwhile
+    library = player.library
     
     # Handle empty library case gracefully
-    if not player.audio_files:
-        player.playlist = []
-        player.current = 0
+    if not library.audio_files:
+        session.playlist = []
+        session.current = 0
         return {
             "playlist": [],
-            "autoplay": player.autoplay_next,
+            "autoplay": session.autoplay_next,
             "current": 0
         }
     
-    # Filter by genre more efficiently
-    filtered = []
-    
-    # Only filter if we have genres specified
-    if genres and isinstance(genres, (list, tuple)) and len(genres) > 0:
-        # Skip empty genre lists
-        genres = [g for g in genres if g]  # Remove empty entries
-        
-        if genres:  # Still have genres after filtering empty ones
-            # Use a more efficient approach - convert genres to a set for O(1) lookups
-            genre_set = set(genres)
-            
-            # Pre-compute which files match to avoid nested loops
-            for f in player.audio_files:
-                file_genres = player.tags_cache.get(f, {}).get('genres', [])
-                if any(g in genre_set for g in file_genres):
-                    filtered.append(f)
-        else:
-            # No valid genres, use all files
-            filtered = player.audio_files.copy()
+    # Filter by genre more efficiently (catalog ids); only lists/tuples of genres count
+    genres = [g for g in genres if g] if isinstance(genres, (list, tuple)) else []  # Remove empty entries
+    if genres:
+        # Union of the genre posting lists, no pass over the library
+        filtered = library.genre_index.tracks(genres)
     else:
-        # No genres specified, use all files
-        filtered = player.audio_files.copy()
+        # No valid genres, use all files
+        filtered = library.catalog.ids()
     
-    # Use all available if we have fewer songs than requested
-    if len(filtered) <= n:
-        player.playlist = filtered.copy()
-    else:
-        # Take a random sample (more efficient than shuffling the whole list)
-        player.playlist = random.sample(filtered, n)
+    # Random sample with no artist taking over the playlist
+    session.playlist = session.sample_playlist(filtered, n, library)
     
     # Reset current position
-    player.current = 0
+    session.current = 0
     
     # Return table along with metadata
-    playlist_table = player.get_playlist_table()
+    playlist_table = session.get_playlist_table()
     
     # Return results with minimal data processing
     return {
         "playlist": playlist_table,
-        "autoplay": player.autoplay_next,
-        "current": player.current
+        "autoplay": session.autoplay_next,
+        "current": session.current
     }
 
 # Helper: pick songs to match target duration (minutes) with optional genre and year filters
-def pick_songs_by_duration(target_minutes, genres=None, year_start=None, year_end=None, title_keywords=None, album_filters=None):
-    import random
-    player.autoplay_next = True
-    pool = []
-    for f in player.audio_files:
-        tags = player.tags_cache.get(f, {})
-        # Genre filter
-        if genres and not any(g in tags.get('genres', []) for g in genres):
-            continue
-        # Title keywords
-        if title_keywords:
-            title = tags.get('title','').lower()
-            if not any(kw.lower() in title for kw in title_keywords):
-                continue
-        # Album filters
-        if album_filters:
-            album = tags.get('album','').lower()
-            if not any(af.lower() in album for af in album_filters):
-                continue
-        if year_start and tags.get('year') and tags['year'] < year_start:
-            continue
-        if year_end and tags.get('year') and tags['year'] > year_end:
-            continue
-        pool.append(f)
-    random.shuffle(pool)
-    target_sec = target_minutes * 60
-    total = 0
-    playlist = []
-    for f in pool:
-        dur = player.tags_cache.get(f, {}).get('duration', 0)
-        if playlist and total + dur > target_sec:
-            break
-        playlist.append(f)
-        total += dur
-    player.playlist = playlist
-    player.current = 0
+def pick_songs_by_duration(target_minutes, genres=None, year_start=None, year_end=None, title_keywords=None, album_filters=None,
+                           tolerance_seconds=DEFAULT_DURATION_TOLERANCE, session=None):
+    """Fill the playlist with about target_minutes of music; returns the achieved length in seconds."""
+    session = session or player
+    session.autoplay_next = True
+    library = player.library
+    catalog = library.catalog
+    # Keywords are matched once per distinct title/album, then the columns are masked
+    title_codes = album_codes = None
+    if title_keywords:
+        kws = [kw.lower() for kw in title_keywords]
+        title_codes = catalog.titles.matching(lambda title: any(kw in title for kw in kws))
+    if album_filters:
+        afs = [af.lower() for af in album_filters]
+        album_codes = catalog.albums.matching(lambda album: any(af in album for af in afs))
+    candidates = library.genre_index.tracks(genres) if genres else None
+    pool = catalog.select(candidates, year_start, year_end, title_codes=title_codes, album_codes=album_codes)
+    # Tracks are drawn lazily and the last gap is closed with best-fitting ones
+    playlist, total = fit_duration(pool, catalog.duration.__getitem__, target_minutes * 60, tolerance_seconds)
+    session.playlist = catalog.paths_of(playlist)
+    session.current = 0
+    return total
 
 # New helper: pick N songs using advanced filters
-def pick_songs_by_filters(n, genres=None, title_keywords=None, album_filters=None, year_start=None, year_end=None, artist_filters=None):
-    import random
-    from rapidfuzz.fuzz import ratio
+def pick_songs_by_filters(n, genres=None, title_keywords=None, album_filters=None, year_start=None, year_end=None, artist_filters=None,
+                          session=None):
+    session = session or player
     FUZZY_THRESHOLD = 80
     # Validate and cap song count
     try:
         n = max(1, min(int(n), 100))
     except (ValueError, TypeError):
         n = load_pick_count()
-    player.autoplay_next = True
-    pool = []
-
-    
-    pool = []
-    for f in player.audio_files:
-        tags = player.tags_cache.get(f, {})
-
-        # Genre
-        if genres and not any(g in tags.get('genres', []) for g in genres):
-            continue
-        # Title keywords
-        if title_keywords:
-            title = tags.get('title', '').lower()
-            if not any(ratio(kw.lower(), title) >= FUZZY_THRESHOLD for kw in title_keywords):
-                continue
-        # Album filters
-        if album_filters:
-            album = tags.get('album', '').lower()
-            if not any(ratio(a.lower(), album) >= FUZZY_THRESHOLD for a in album_filters):
-                continue
-        # Artist filters
-        if artist_filters:
-            artist = tags.get('artist', '').lower()
-            if not any(ratio(a.lower(), artist) >= FUZZY_THRESHOLD for a in artist_filters):
-                continue
-        # Year range
-        if year_start and tags.get('year') and tags['year'] < year_start:
-            continue
-        if year_end and tags.get('year') and tags['year'] > year_end:
-            continue
-        pool.append(f)
-    
-    if not pool:
-        player.playlist = []
-        player.current = 0
-        return
-    if len(pool) <= n:
-        playlist = pool.copy()
-    else:
-        playlist = random.sample(pool, n)
-    player.playlist = playlist
-    player.current = 0
+    session.autoplay_next = True
+    library = player.library
+    catalog = library.catalog
+    workers = load_fuzzy_workers()
+
+    def fuzzy_codes(vocab, keywords):
+        # Each distinct title/album/artist is scored once, not once per track
+        return vocab.fuzzy_matching(keywords, FUZZY_THRESHOLD, workers=workers)
+
+    title_codes = fuzzy_codes(catalog.titles, title_keywords) if title_keywords else None
+    album_codes = fuzzy_codes(catalog.albums, album_filters) if album_filters else None
+    artist_codes = fuzzy_codes(catalog.artists, artist_filters) if artist_filters else None
+    candidates = library.genre_index.tracks(genres) if genres else None
+    pool = catalog.select(candidates, year_start, year_end, title_codes=title_codes,
+                          album_codes=album_codes, artist_codes=artist_codes)
+    session.playlist = session.sample_playlist(pool, n, library)
+    session.current = 0
+
+# Playlist versions are unique across sessions, so a URL or ETag stamped
+# with one never matches another session's playlist
+_playlist_versions = itertools.count(1)
 
 class MusicPlayerGradio:
     def __init__(self):
+        self._init_playlist()
         self.folders = []
-        self.audio_files = []
-        self.playlist = []
-        self.current = 0
-        self.genres = set()
-        self.genre_filter = set()
+        # Replaced as a whole by publish_library, never changed in place
+        self.library = EMPTY_LIBRARY
+        self._publish_lock = threading.Lock()
+        self.scan_token = None  # CancelToken of the running scan
         self.tags_cache = {}
         self.scanning = False
+        self.scan_status = ""
+
+    def _init_playlist(self, playlist=()):
+        # Every playlist/current change bumps the version and is pushed to /events
+        self.events = PlaylistEvents()
+        self._version_lock = threading.Lock()
+        self.playlist_version = next(_playlist_versions)
+        self._playlist = list(playlist)
+        self._current = 0
+        self._items = (None, [])  # Playlist JSON rows of one playlist and library version, see playlist_items
+        self.genre_filter = set()
         self.autoplay_next = False  # Flag to indicate if next playlist load should autoplay
 
+    @property
+    def playlist(self):
+        return self._playlist
+
+    @playlist.setter
+    def playlist(self, playlist):
+        self._playlist = playlist
+        self._changed()
+
+    @property
+    def current(self):
+        return self._current
+
+    @current.setter
+    def current(self, current):
+        if current != self._current:
+            self._current = current
+            self._changed()
+
+    # Read-only views of the current library snapshot. Code that reads more
+    # than one of them should take self.library once instead.
+    @property
+    def catalog(self):
+        return self.library.catalog
+
+    @property
+    def genre_index(self):
+        return self.library.genre_index
+
+    @property
+    def audio_files(self):
+        return self.library.audio_files
+
+    @property
+    def genres(self):
+        return self.library.genres
+
+    def publish_library(self, library, token=None, commit=None):
+        """Swap in a new library snapshot unless token was cancelled meanwhile; returns whether it was.
+
+        commit() runs under the same lock right before the swap, so what it
+        persists and the snapshot go live together, or (when cancelled) not at all.
+        """
+        with self._publish_lock:
+            if token is not None and token.is_cancelled():
+                return False
+            if commit is not None:
+                commit()
+            self.library = library
+            return True
+
+    def playlist_state(self):
+        return {"version": self.playlist_version, "current": self._current, "autoplay": self.autoplay_next}
+
+    def _changed(self):
+        with self._version_lock:
+            self.playlist_version = next(_playlist_versions)
+            state = self.playlist_state()
+        self.events.publish(state)
+
     def scan_files(self, folders):
         self.folders = folders
-        self.audio_files = get_audio_files(folders, AUDIO_EXTS)
+        audio_files = get_audio_files(folders, AUDIO_EXTS)
         self.tags_cache = {}
-        genre_set = set()
+        catalog = TrackCatalog()
+        genre_index = GenreIndex()
 
-        for i, f in enumerate(self.audio_files):
+        for i, f in enumerate(audio_files):
             tags = get_tags(f)
             # Fetch missing metadata if needed
             if not tags.get('year') or not tags.get('artist') or not tags.get('album') or not tags.get('title'):
 
                 tags = get_tags(f)  # Re-read after update
             self.tags_cache[f] = tags
-            genre_set.update(tags.get('genres', []))
+            genre_index.set(catalog.add(f, tags), tags.get('genres', []))
             if i < 3:
                 if hasattr(File(f), 'tags') and File(f).tags:
                     for k in File(f).tags.keys():
                         pass
                 else:
                     pass
-            self.genres = genre_set
-            self.genre_filter = set()
-            self.playlist = self.audio_files.copy()
-        random.shuffle(self.playlist)
+        self.publish_library(LibrarySnapshot(catalog, genre_index, audio_files))
+        self.genre_filter = set()
+        # Shuffled before it is published, so no client sees the unshuffled list
+        playlist = self.audio_files.copy()
+        random.shuffle(playlist)
+        self.playlist = playlist
         self.current = 0
         print(f"[DEBUG] scan_files: Playlist populated with {len(self.playlist)} songs.")
         # Always return the genre list, even if empty
@@ -365,31 +337,35 @@ class MusicPlayerGradio:
         if genres is None:
             genres = []
         self.genre_filter = set(genres)
-        if not genres:
-            self.playlist = self.audio_files.copy()
-        else:
-            self.playlist = [f for f in self.audio_files if any(g in self.tags_cache.get(f, {}).get('genres', []) for g in genres)]
-        random.shuffle(self.playlist)
+        library = self.library
+        playlist = library.audio_files.copy() if not genres else self.files_with_genres(genres, library)
+        random.shuffle(playlist)
+        self.playlist = playlist
         self.current = 0
         return self.get_playlist_table()
 
+    def sample_playlist(self, ids, n, library=None):
+        """Up to n random paths from catalog ids (of library's catalog), capping how many one artist gets."""
+        catalog = (library or self.library).catalog
+        return catalog.paths_of(sample_by_artist(catalog.group_by_artist(ids), n))
+
+    def files_with_genres(self, genres, library=None):
+        """Library files tagged with any of genres, looked up in the genre index."""
+        library = library or self.library
+        return library.catalog.paths_of(library.genre_index.tracks(genres))
+
     def get_playlist_table(self):
+        # Rows come from the catalog columns; no tags are loaded and no file is opened
+        library = self.library
         rows = []
-        for idx, f in enumerate(self.playlist): tags = self.tags_cache.get(f) or get_tags(f)
-        # Make sure we have at least a title
-        title = tags.get('title')
-        if not title or title.strip() == '':
-            title = os.path.basename(f)
-        artist = tags.get('artist', '')
-        album = tags.get('album', '')
-        # Fix empty or zero years
-        year = tags.get('year', '')
-        if year == 0 or not str(year).strip():
-            year = ''
-        genres = ', '.join(tags.get('genres', []))
-        # Only add rows with valid titles
-        if title and title.strip() != '':
-            rows.append([idx+1, title, artist, album, year, genres])
+        for idx, f in enumerate(self.playlist):
+            track_id = library.catalog.id_of(f)
+            if track_id is None:
+                rows.append([idx+1, os.path.basename(f), '', '', '', ''])
+                continue
+            title, artist, album, year, _ = library.catalog.fields(track_id)
+            genres = ', '.join(sorted(library.genre_index.genres_of(track_id)))
+            rows.append([idx+1, title, artist, album, year or '', genres])
         return rows
 
     def get_current_audio(self):
@@ -408,6 +384,7 @@ class MusicPlayerGradio:
             # Playlist is empty or invalid
             return None, "No song loaded", "", "No songs found in playlist. Please scan folders or check your music directory."
         lyrics = fetch_lyrics(artist, title) if artist and title else ""
+        prefetch_lyrics(self.current + 1, self)
         return audio_url, title, artist, lyrics
 
     def next(self):
@@ -424,6 +401,27 @@ class MusicPlayerGradio:
             self.current -= 1
         return self.play()
 
+class PlayerSession(MusicPlayerGradio):
+    """One listener's playlist, cursor and autoplay flag over the library of the `shared` player."""
+
+    def __init__(self, shared):
+        self.shared = shared
+        # Starts out with the shared playlist, as every page did before sessions, but
+        # at most pick_count random songs of it: after a scan that playlist is the
+        # whole library, and every session would build and keep rows for all of it
+        playlist = shared.playlist
+        n = load_pick_count()
+        if len(playlist) > n:
+            playlist = random.sample(playlist, n)
+        self._init_playlist(playlist)
+
+    def __getattr__(self, name):
+        # Library attributes (library, tags_cache, scan status, ...) are read from the shared player
+        if name == "shared":
+            raise AttributeError(name)
+        return getattr(self.shared, name)
+
+# The shared library, and the playlist of clients without a session
 player = MusicPlayerGradio()
 
 def parse_folder_input(folder_input):
@@ -441,106 +439,252 @@ import json
 import os
 
 CACHE_DIR = "cache"
-CACHE_FILE = os.path.join(CACHE_DIR, "scan_cache.json")
-
-def save_scan_cache(folders, audio_files, tags_cache, genres, folder_input_value=None):
+CACHE_FILE = os.path.join(CACHE_DIR, "scan_cache.json")  # Legacy, migrated into DB_FILE
+DB_FILE = os.path.join(CACHE_DIR, "library.db")
+
+track_store = TrackStore(DB_FILE)
+lyrics_service = LyricsService(os.path.join(CACHE_DIR, "lyrics"))
+thumbnail_cache = ThumbnailCache(os.path.join(CACHE_DIR, "thumbnails"))
+# Filled by the scanner, so playlist JSON never stats cover files
+folder_covers = FolderCoverCache()
+transcoder = Transcoder(os.path.join(CACHE_DIR, "transcodes"))
+# Blocking work of the async endpoints runs here, never on the event loop;
+# full pools answer 503 (see executors)
+io_executor = BoundedExecutor("io", IO_WORKERS, IO_MAX_PENDING)
+cpu_executor = BoundedExecutor("cpu", CPU_WORKERS, CPU_MAX_PENDING)
+request_metrics = RequestMetrics()
+if track_store.migrate_json_cache(CACHE_FILE):
+    print(f"[Startup] Migrated {CACHE_FILE} into {DB_FILE}")
+if track_store.get_meta("tag_reader_version", 1) != TAG_READER_VERSION:
+    # MP3 rows read before ID3 frames were mapped lack title, artist, album and year
+    track_store.invalidate(".mp3")
+    track_store.set_meta("tag_reader_version", TAG_READER_VERSION)
+# Tags are read from the store row by row on first access
+player.tags_cache = StoredTagsCache(track_store)
+
+def save_scan_cache(folders, folder_input_value=None):
+    # Track rows are written during the scan; only the folder settings remain
     try:
-        if not os.path.isdir(CACHE_DIR):
-            os.makedirs(CACHE_DIR, exist_ok=True)
-        cache = {
-            "folders": folders,
-            "audio_files": audio_files,
-            "tags_cache": tags_cache,
-            "genres": list(genres)
-        }
+        track_store.set_meta("folders", folders)
         if folder_input_value is not None:
-            cache["folder_input_value"] = folder_input_value
-        with open(CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(cache, f)
+            track_store.set_meta("folder_input_value", folder_input_value)
     except Exception as e:
         print(f"[WARNING] Could not save scan cache: {e}")
 
 def load_scan_cache():
-    if not os.path.isfile(CACHE_FILE):
-        return None
+    """Return the cached folder settings, or None if nothing was scanned yet."""
     try:
-        with open(CACHE_FILE, "r", encoding="utf-8") as f:
-            cache = json.load(f)
-        return cache
+        folders = track_store.get_meta("folders")
+        if folders is None:
+            return None
+        return {"folders": folders, "folder_input_value": track_store.get_meta("folder_input_value")}
     except Exception as e:
         print(f"[WARNING] Could not load scan cache: {e}")
         return None
 
-def background_scan(folders):
-    audio_files = get_audio_files(folders, AUDIO_EXTS)
-    genres = set()
-    player.audio_files = []
-    player.tags_cache = {}
+def load_library_index():
+    """Build the track catalog and its genre index from the store's indexed columns."""
+    catalog = TrackCatalog.build(track_store.iter_summaries())
+    index = GenreIndex.build((catalog.id_of(f), genres) for f, genres in track_store.iter_track_genres() if f in catalog)
+    return catalog, index
+
+def restore_scan_cache():
+    # Only the indexed columns and genre names are read now; full tags load lazily
+    player.tags_cache = StoredTagsCache(track_store)
+    catalog, index = load_library_index()
+    player.publish_library(LibrarySnapshot(catalog, index, track_store.paths()))
+    player.genre_filter = set()
+    player.playlist = player.audio_files.copy()
+    player.current = 0
+    player.scanning = False
+
+def background_scan(folders, token=None):
+    # Incremental: only new or changed files (by mtime/size/inode) are re-read
+    token = token or CancelToken()
     player.scanning = True
-    for i, f in enumerate(audio_files):
-        if not player.scanning:
-            break
-        tags = get_tags(f)
-        player.audio_files.append(f)
-        player.tags_cache[f] = tags
-        genres.update(tags.get('genres', []))
-        player.genres = genres
+    player.scan_status = "Listing files..."
+    workers, use_processes = load_scan_settings()
+    def on_progress(done, f):
+        if done % 100 == 0:
+            player.scan_status = f"Checked {done} files"
+    # The scan updates copies of the catalog and genre index and publishes them
+    # in one snapshot at the end; without a library loaded yet, start from the store
+    library = player.library
+    if len(library.catalog):
+        catalog, index = library.catalog.copy(), library.genre_index.copy()
+    else:
+        catalog, index = load_library_index()
+    def on_tags(f, tags, fingerprint):
+        # Only the private copies; the store and tags cache are written when the result is published
+        index.set(catalog.add(f, tags), tags.get('genres', []))
+    # The walk also fills the cover lookup and teaches the watcher the tree
+    watch_mode = load_watch_mode()
+    watcher = LibraryWatcher(folders, lambda changes: apply_library_changes(changes, token),
+                             polling=True if watch_mode == "polling" else None)
+    def on_dir(path, mtime_ns, names, subdirs):
+        folder_covers.record(path, mtime_ns, names)
+        watcher.record_dir(path, mtime_ns, names, subdirs)
+    # Tag reading starts while the folders are still being walked
+    entries = iter_audio_entries(folders, AUDIO_EXTS, on_dir=on_dir)
+    result = incremental_scan(entries, get_tags, player.tags_cache,
+                              track_store.fingerprints(), should_stop=token.is_cancelled,
+                              on_progress=on_progress, on_tags=on_tags, workers=workers,
+                              use_processes=use_processes, keep_unchanged=False)
+    if result.cancelled:
+        if player.scan_token is token:
+            player.scanning = False
+            player.scan_status = "Scan cancelled."
+        return
+    for f in result.removed:
+        track_id = catalog.remove(f)
+        if track_id is not None:
+            index.remove(track_id)
+    def commit():
+        # result.tags_cache holds just the re-read files (keep_unchanged=False)
+        for f, tags in result.tags_cache.items():
+            track_store.put(f, tags, result.fingerprints[f])
+            player.tags_cache[f] = tags
+        track_store.delete(result.removed)
+        # Files carried over from a cache without fingerprints get one now
+        track_store.set_fingerprints({f: fp for f, fp in result.fingerprints.items() if f not in result.tags_cache})
+        for f in result.removed:
+            player.tags_cache.pop(f, None)
+    # A newer scan or clear_cache may have cancelled this one meanwhile; then nothing is written
+    if not player.publish_library(LibrarySnapshot(catalog, index, result.audio_files), token, commit):
+        return
     player.genre_filter = set()
     player.playlist = player.audio_files.copy()
     player.current = 0
     player.scanning = False
-    # Save scan to cache
-    # Save scan to cache, including the folder input value
-    save_scan_cache(folders, player.audio_files, player.tags_cache, player.genres, getattr(player, 'last_folder_input', None))
+    player.scan_status = f"Scan complete: {len(player.audio_files)} songs ({result.summary()})."
+    print(f"[Scan] {player.scan_status}")
+    # Save the folder input value alongside the library
+    save_scan_cache(folders, getattr(player, 'last_folder_input', None))
+    if watch_mode != "off":
+        start_library_watcher(watcher)
+
+# Live updates between scans (see library_watcher); replaced after every scan
+library_watcher = None
+
+def start_library_watcher(watcher):
+    global library_watcher
+    stop_library_watcher()
+    library_watcher = watcher.start()
+
+def stop_library_watcher():
+    global library_watcher
+    if library_watcher is not None:
+        library_watcher.stop()
+        library_watcher = None
+
+def apply_library_changes(changes, token=None):
+    """Apply one watcher batch as a new library snapshot; only the files it lists are read.
+
+    token is the CancelToken of the scan that started the watcher; once a
+    newer scan has cancelled it, the batch is dropped (that scan reads the
+    files itself).
+    """
+    library = player.library
+    catalog, index = library.catalog.copy(), library.genre_index.copy()
+    removed = set(changes.removed)
+    for d in changes.removed_dirs:
+        prefix = d.rstrip(os.sep) + os.sep
+        removed.update(f for f in catalog.paths if f is not None and f.startswith(prefix))
+    removed.difference_update(changes.changed)
+    for f in removed:
+        track_id = catalog.remove(f)
+        if track_id is not None:
+            index.remove(track_id)
+    new = []
+    rows = []
+    workers, _ = load_scan_settings()
+    # Threads, not processes: a batch is usually a handful of files
+    for f, tags, error in iter_tags(sorted(changes.changed), get_tags, workers=min(workers, len(changes.changed))):
+        if error is not None or tags is None:
+            print(f"[WARNING] Could not read {f}: {error}")
+            continue
+        try:
+            fingerprint = file_fingerprint(f)
+        except OSError:
+            continue  # Gone again
+        if f not in catalog:
+            new.append(f)
+        index.set(catalog.add(f, tags), tags.get('genres', []))
+        rows.append((f, tags, fingerprint))
+    def commit():
+        track_store.delete(removed)
+        for f in removed:
+            player.tags_cache.pop(f, None)
+        for f, tags, fingerprint in rows:
+            track_store.put(f, tags, fingerprint)
+            player.tags_cache[f] = tags
+            folder_covers.refresh(os.path.dirname(f))
+        track_store.flush()
+    audio_files = [f for f in library.audio_files if f not in removed] if removed else library.audio_files
+    if not player.publish_library(LibrarySnapshot(catalog, index, audio_files + new), token, commit):
+        return
+    player.scan_status = f"Library updated: {len(player.audio_files)} songs ({changes.summary()})."
+    print(f"[Watch] {player.scan_status}")
+    event = {"songs": len(player.audio_files), "changed": len(changes.changed), "removed": len(removed)}
+    for session in [player, *sessions.values()]:
+        session.events.publish(event, name="library")
 
 def start_background_scan(folder_input):
     folders = parse_folder_input(folder_input)
     player.last_folder_input = folder_input
-    # Stop any previous scan
-    if hasattr(player, 'scanning') and player.scanning:
-        player.scanning = False
-        time.sleep(0.1)
-    # Check cache
+    # Cancel any previous scan; it stops at its next file and never publishes
+    if player.scan_token is not None:
+        player.scan_token.cancel()
+    stop_library_watcher()
+    token = player.scan_token = CancelToken()
+    # Show the cached library right away; the incremental scan below reuses
+    # every stored track that is still present and unchanged
     cache = load_scan_cache()
-    if cache and cache.get("folders") == folders:
-        # Load from cache
-        player.audio_files = cache["audio_files"]
-        player.tags_cache = cache["tags_cache"]
-        player.genres = set(cache["genres"])
-        player.genre_filter = set()
-        player.playlist = player.audio_files.copy()
-        player.current = 0
-        player.scanning = False
-        # Also remember last folder input
-        player.last_folder_input = cache.get("folder_input_value", folder_input)
-        status = f"Loaded {len(player.audio_files)} songs from cache."
-        return status, gr.update(choices=sorted(list(player.genres)), value=[]), status
-    # Otherwise, scan in background
-    scan_thread = threading.Thread(target=background_scan, args=(folders,), daemon=True)
+    if cache and not player.audio_files and cache.get("folders") == folders:
+        restore_scan_cache()
+    scan_thread = threading.Thread(target=background_scan, args=(folders, token), daemon=True)
     scan_thread.start()
+    library = player.library
+    if library.audio_files:
+        status = f"Loaded {len(library.audio_files)} songs, checking for changes in background... (click Refresh to update)"
+        return status, gr.update(choices=sorted(library.genres), value=[]), status
     status = "Scanning in background... (click Refresh to update)"
     return status, gr.update(choices=[]), status
 
 def refresh_playlist_and_genres():
-    # Only update the UI with the current scan progress; do NOT start a new scan or touch the cache
-    genres = set()
-    for f in player.audio_files:
-        tags = player.tags_cache.get(f) or get_tags(f)
-        genres.update(tags.get('genres', []))
-    player.genres = genres
-    status = f"Songs found so far: {len(player.audio_files)} (refresh only, scan may still be running)"
-    return status, gr.update(choices=sorted(list(player.genres)), value=[]), status
+    # Only update the UI with the current scan progress; do NOT start a new scan
+    library = player.library
+    if player.scanning:
+        status = f"Songs found so far: {len(library.audio_files)} ({player.scan_status})"
+    elif player.scan_status:
+        status = player.scan_status
+    else:
+        status = f"Songs found so far: {len(library.audio_files)} (refresh only, scan may still be running)"
+    return status, gr.update(choices=sorted(library.genres), value=[]), status
 
 def clear_cache():
     try:
-        if os.path.isfile(CACHE_FILE):
-            os.remove(CACHE_FILE)
+        if track_store.count() or load_scan_cache():
+            # Drops the fingerprints too, so the next scan re-reads every file
+            if player.scan_token is not None:
+                player.scan_token.cancel()
+            def reset():
+                # Under the publish lock: a scan that is publishing finishes first, then is wiped
+                track_store.clear()
+                player.tags_cache = StoredTagsCache(track_store)
+            player.publish_library(EMPTY_LIBRARY, commit=reset)
+            folder_covers.clear()
+            stop_library_watcher()
             return "Cache cleared. Please scan folders again.", gr.update(choices=[]), "Cache cleared."
         else:
             return "No cache to clear.", gr.update(choices=[]), "No cache to clear."
     except Exception as e:
         return f"Error clearing cache: {e}", gr.update(choices=[]), f"Error clearing cache: {e}"
 
+def apply_genre_filter(genres, request: gr.Request):
+    # Reshuffles the requesting browser's playlist from the chosen genres
+    return f"Total songs found: {len(gradio_session(request).filter_by_genre(genres))}"
+
 def update_genre_filter(selected_genres):
     # Only update the song count, not the playlist table, after filtering by genre
     total = len(player.filter_by_genre(selected_genres)) if selected_genres else len(player.audio_files)
@@ -612,6 +756,48 @@ def load_pick_count():
     except Exception:
         return 10
 
+def load_scan_settings():
+    """Return (workers, use_processes) for tag extraction from settings.json.
+
+    "scan_workers" defaults to the CPU count, "scan_executor" is "thread"
+    (default) or "process" (spreads mutagen parsing over all cores; workers
+    are started with forkserver/spawn, never forked from the server).
+    """
+    try:
+        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+            settings = _json.load(f)
+    except Exception:
+        settings = {}
+    try:
+        workers = max(1, int(settings.get("scan_workers", DEFAULT_SCAN_WORKERS)))
+    except (ValueError, TypeError):
+        workers = DEFAULT_SCAN_WORKERS
+    return workers, settings.get("scan_executor", "thread") == "process"
+
+def load_watch_mode():
+    """How the library is watched between scans ("library_watch" in settings.json).
+
+    "auto" (default) uses file system events when watchdog is installed and
+    polls directory mtimes otherwise, "polling" always polls (use it for
+    network mounts, which do not deliver events) and "off" disables it.
+    """
+    try:
+        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+            settings = _json.load(f)
+        mode = settings.get("library_watch", "auto")
+    except Exception:
+        mode = "auto"
+    return mode if mode in ("auto", "polling", "off") else "auto"
+
+def load_fuzzy_workers():
+    """Threads rapidfuzz uses to score filter keywords ("fuzzy_workers", -1 = all cores)."""
+    try:
+        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+            settings = _json.load(f)
+        return int(settings.get("fuzzy_workers", 1))
+    except Exception:
+        return 1
+
 def save_pick_count(n):
     try:
         # Load current settings
@@ -626,6 +812,53 @@ def save_pick_count(n):
         print(f"[WARNING] Could not save pick_count: {e}")
     return n
 
+def load_session_settings():
+    """Return (max_sessions, idle_seconds) for listener sessions from settings.json.
+
+    "max_sessions" caps how many browsers keep their own playlist (the least
+    recently used is dropped first), "session_idle_minutes" drops sessions
+    not used for that long.
+    """
+    try:
+        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+            settings = _json.load(f)
+    except Exception:
+        settings = {}
+    try:
+        max_sessions = max(1, int(settings.get("max_sessions", DEFAULT_MAX_SESSIONS)))
+    except (ValueError, TypeError):
+        max_sessions = DEFAULT_MAX_SESSIONS
+    try:
+        idle_seconds = max(60, int(float(settings["session_idle_minutes"]) * 60))
+    except (KeyError, ValueError, TypeError):
+        idle_seconds = DEFAULT_IDLE_SECONDS
+    return max_sessions, idle_seconds
+
+# One playlist per browser (session cookie), all over the shared library in player
+sessions = SessionStore(lambda: PlayerSession(player), *load_session_settings(),
+                        in_use=lambda session: len(session.events) > 0)
+
+def request_session(request):
+    """(session, new token or None) for the browser behind a FastAPI request."""
+    token, session, created = sessions.get_or_create(request.cookies.get(SESSION_COOKIE))
+    return session, token if created else None
+
+def with_session_cookie(response, token):
+    # Only set when the session was just created
+    if token:
+        response.set_cookie(SESSION_COOKIE, token, httponly=True, samesite="lax")
+    return response
+
+def cookie_session(request):
+    """Existing session of the browser behind request, else the shared player; never creates one."""
+    token = request.cookies.get(SESSION_COOKIE) if request is not None else None
+    # Before the player page has loaded once there is no session yet
+    return sessions.get(token) or player
+
+def gradio_session(request):
+    """Session of the browser behind a Gradio event, i.e. the one its embedded player shows."""
+    return cookie_session(request)
+
 pick_count = gr.Number(value=load_pick_count(), label="Number of Songs to Pick", precision=0)
 with gr.Blocks(theme=THEME_MAP.get(_selected_theme, gr.themes.Soft()), css="""
 /* Make the play button green and pause button red in the audio player */
@@ -703,13 +936,7 @@ audio:-webkit-media-controls-play-button {
                 cached_folders = _cache.get("folders")
                 input_folders = parse_folder_input(_folder_input_value)
                 if cached_folders == input_folders:
-                    player.audio_files = _cache.get("audio_files", [])
-                    player.tags_cache = _cache.get("tags_cache", {})
-                    player.genres = set(_cache.get("genres", []))
-                    player.genre_filter = set()
-                    player.playlist = player.audio_files.copy()
-                    player.current = 0
-                    player.scanning = False
+                    restore_scan_cache()
             with gr.Row():
                 scan_btn = gr.Button("Scan Folders", elem_classes="small-btn")
                 refresh_btn = gr.Button("Refresh Playlist / Genres", elem_classes="small-btn")
@@ -752,35 +979,36 @@ audio:-webkit-media-controls-play-button {
                 outputs=[song_count_text, genre_dropdown, status_text]
             )
             update_genre_btn.click(
-                fn=lambda genres: f"Total songs found: {len(player.filter_by_genre(genres))}",
+                fn=apply_genre_filter,
                 inputs=[genre_dropdown],
                 outputs=[song_count_text]
             )
             # Connect the Pick songs button - simple pre-LLM style
-            def pick_and_update_table(n, genres):
+            def pick_and_update_table(n, genres, request: gr.Request):
                 # Simple function like before LLM integration
+                session = gradio_session(request)
                 try:
                     n = max(1, min(int(n), 100))
                 except (ValueError, TypeError):
                     n = load_pick_count()
                 
                 # Set autoplay flag
-                player.autoplay_next = True
+                session.autoplay_next = True
                 
                 # Simple filtering and playlist update
                 if genres:
-                    filtered = [f for f in player.audio_files if any(g in player.tags_cache.get(f, {}).get('genres', []) for g in genres)]
+                    filtered = player.files_with_genres(genres)
                 else:
                     filtered = player.audio_files.copy()
                 
                 # Update playlist
                 if len(filtered) <= n:
-                    player.playlist = filtered.copy()
+                    session.playlist = filtered.copy()
                 else:
                     import random
-                    player.playlist = random.sample(filtered, n)
+                    session.playlist = random.sample(filtered, n)
                 
-                player.current = 0
+                session.current = 0
                 
                 # Use enhanced direct approach to refresh the player with better parameters
                 js_code = '''
@@ -805,7 +1033,7 @@ audio:-webkit-media-controls-play-button {
                 '''
                 
                 # Return new playlist table and refresh script
-                return player.get_playlist_table(), gr.update(value=js_code)
+                return session.get_playlist_table(), gr.update(value=js_code)
             
             autoplay_script = gr.HTML(visible=True)
             
@@ -846,7 +1074,8 @@ audio:-webkit-media-controls-play-button {
             with gr.Row():
                 chat_status = gr.Markdown("")
             
-            def chat_and_pick_songs(message, history):
+            def chat_and_pick_songs(message, history, request: gr.Request):
+                session = gradio_session(request)
                 # Check if OpenRouter integration is available
                 if parse_genre_request is None:
                     return history + [{"role": "assistant", "content": "OpenRouter integration is not available. Please make sure openrouter_utils.py is in the same directory."}], "", None
@@ -879,7 +1108,8 @@ audio:-webkit-media-controls-play-button {
                     
                     # Pick by duration if specified, otherwise by count
                     if duration:
-                        pick_songs_by_duration(duration, selected_genres, year_start, year_end, title_keywords, album_filters)
+                        achieved = pick_songs_by_duration(duration, selected_genres, year_start, year_end, title_keywords, album_filters,
+                                                          session=session)
                         # Build optional year text
                         yr_text = ""
                         if year_start and year_end:
@@ -888,16 +1118,17 @@ audio:-webkit-media-controls-play-button {
                             yr_text = f" from {year_start} onward"
                         elif year_end:
                             yr_text = f" up to {year_end}"
-                        response = f"Playing ~{duration} minutes of {', '.join(selected_genres)} songs{yr_text}. The music will start momentarily."
+                        response = f"Playing {round(achieved / 60)} minutes (asked for {duration}) of {', '.join(selected_genres)} songs{yr_text}. The music will start momentarily."
                         # Check if any songs were picked
-                        if not player.playlist:
+                        if not session.playlist:
                             response = "No songs matched your filters. Please try different criteria."
                     else:
-                        pick_songs_by_filters(num_songs, selected_genres, title_keywords, album_filters, year_start, year_end, artist_filters)
+                        pick_songs_by_filters(num_songs, selected_genres, title_keywords, album_filters, year_start, year_end, artist_filters,
+                                              session=session)
                         
                         # Set autoplay only if songs were picked
-                        if player.playlist:
-                            player.autoplay_next = True
+                        if session.playlist:
+                            session.autoplay_next = True
                         # Add year/decade info to response if present
                         yr_text = ""
                         if year_start and year_end:
@@ -920,7 +1151,7 @@ audio:-webkit-media-controls-play-button {
                         filter_summary = "; ".join(filter_parts)
                         response = f"Playing {num_songs} songs from filters: {filter_summary}. The music will start momentarily."
                         # Check if any songs were picked
-                        if not player.playlist:
+                        if not session.playlist:
                             response = "No songs matched your filters. Please try different criteria."
                     # Add assistant answer to chat history
                     new_history.append({"role": "assistant", "content": response})
@@ -1222,10 +1453,12 @@ allowed_paths = get_allowed_paths()
 
 # --- Hybrid API (FastAPI) endpoints ---
 from fastapi import FastAPI
-from fastapi.responses import Response, FileResponse, JSONResponse
+from fastapi.responses import Response, FileResponse, JSONResponse, StreamingResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 import mimetypes
 from fastapi.staticfiles import StaticFiles
+from fastapi import Query
+from urllib.parse import urlencode
 
 app = FastAPI()
 
@@ -1244,17 +1477,153 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(LatencyMiddleware, metrics=request_metrics)
+
+@app.exception_handler(ExecutorBusy)
+async def executor_busy(request: Request, exc: ExecutorBusy):
+    # Shed load instead of queueing without bound behind a slow disk
+    return JSONResponse({"error": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
+# API: /metrics/latency - per-endpoint latency histograms and executor load
+@app.get("/metrics/latency")
+async def latency_metrics(reset: bool = False):
+    summary = {"endpoints": request_metrics.summary(),
+               "executors": {pool.name: pool.stats() for pool in (io_executor, cpu_executor)}}
+    if reset:
+        request_metrics.reset()
+    return JSONResponse(summary)
 
 # Helper to get cover art path (if any)
 def get_cover_path(filepath):
-    # Look for cover.jpg/png in the same folder, or embedded cover in tags
-    folder = os.path.dirname(filepath)
-    for name in ["cover.jpg", "cover.png", "folder.jpg", "folder.png"]:
-        test_path = os.path.join(folder, name)
-        if os.path.isfile(test_path):
-            return test_path
-    # Embedded cover art: not implemented here (mutagen can extract, but needs more logic)
-    return None
+    # cover.jpg/png or folder.jpg/png in the same folder; a stat of the folder, listed by the scan
+    return folder_covers.get(filepath)
+
+def cover_source(filepath):
+    """(thumbnail key, load) of a track's art: the folder cover, else the embedded picture.
+
+    The key follows the source file's mtime and size, so changed art gets
+    new renditions; load() returns the image bytes for the thumbnail pool.
+    """
+    # Re-listed when the folder changed, so a cover added later is found
+    cover_path = folder_covers.refresh(os.path.dirname(filepath))
+    if cover_path:
+        st = os.stat(cover_path)
+        def load():
+            with open(cover_path, 'rb') as fh:
+                return fh.read()
+        return source_key(cover_path, st.st_mtime_ns, st.st_size), load
+    return source_key(filepath, *file_fingerprint(filepath)), lambda: read_embedded_cover(filepath)
+
+def has_cover(filepath, tags):
+    # Tracks scanned before has_cover was recorded may still have embedded art
+    return bool(get_cover_path(filepath)) or tags.get('has_cover', True)
+
+def track_tags(filepath):
+    # Stored tags, else read from the file
+    return player.tags_cache.get(filepath) or get_tags(filepath)
+
+def etag_matches(request, etag):
+    # If-None-Match may list several tags, or be "*"
+    header = request.headers.get("if-none-match")
+    return header is not None and (header.strip() == "*" or etag in (t.strip() for t in header.split(",")))
+
+def fingerprint_version(fingerprint):
+    """The ?v= value of a track's audio URL for its stored fingerprint."""
+    return hashlib.sha1(repr(fingerprint).encode()).hexdigest()[:12]
+
+def track_audio_url(filepath):
+    """Stable audio URL of a track: its catalog id plus a hash of its file fingerprint."""
+    track_id = player.catalog.id_of(filepath)
+    if track_id is None:
+        return None
+    fingerprint = track_store.fingerprint(filepath)
+    if fingerprint is None:
+        return f"/tracks/{track_id}/audio"  # Not fingerprinted yet; served revalidated
+    return f"/tracks/{track_id}/audio?v={fingerprint_version(fingerprint)}"
+
+def playlist_stamp(session):
+    """Version of session's playlist rows: a new playlist or a new library snapshot changes it."""
+    return f"{session.playlist_version}-{player.library.version}"
+
+def playlist_items(session):
+    """JSON rows for session's playlist, built once per playlist_stamp; URLs only change with it."""
+    version = playlist_stamp(session)  # Read first, so the rows are never older than it
+    cached_version, items = session._items
+    if cached_version == version:
+        return items
+    items = []
+    for idx, f in enumerate(session.playlist):
+        tags = player.tags_cache.get(f) or get_tags(f)
+        cover_url = f"/cover/{idx}?v={version}" if has_cover(f, tags) else None
+        items.append({
+            "index": idx,
+            "title": tags.get('title', os.path.basename(f)),
+            "artist": tags.get('artist', ''),
+            "album": tags.get('album', ''),
+            "year": tags.get('year', ''),
+            "genres": tags.get('genres', []),
+            "audio_url": track_audio_url(f) or f"/audio/{idx}?v={version}",
+            "lyrics_url": f"/lyrics/{idx}?v={version}",
+            "cover_url": cover_url
+        })
+    session._items = (version, items)
+    return items
+
+def shuffle_new_playlist(session, force_refresh=None):
+    """Replace session's playlist with 10 random songs (/playlist?new_playlist=1)."""
+    print(f"Server received forced playlist refresh with parameter: {force_refresh}")
+    
+    # Generate truly fresh random playlist
+    import random
+    import time
+    
+    # Use a different seed each time
+    random_seed = int(time.time() * 1000000) + random.randint(1, 1000000)
+    random.seed(random_seed)
+    print(f"Using random seed: {random_seed}")
+    
+    # Get all audio files and randomly select some
+    all_files = player.audio_files.copy()
+    if all_files:
+        random.shuffle(all_files)
+        n = min(len(all_files), 10)  # Default to 10 songs
+        
+        # Get current playlist titles for comparison
+        current_titles = []
+        if session.playlist:
+            for f in session.playlist[:3]:
+                tags = player.tags_cache.get(f, {}) 
+                current_titles.append(tags.get('title', os.path.basename(f)))
+        
+        # Generate new playlist
+        new_playlist = all_files[:n]
+        
+        # Check if first song is the same, if so, shift the playlist
+        if session.playlist and new_playlist and session.playlist[0] == new_playlist[0]:
+            print("First song is the same - shifting playlist")
+            if len(new_playlist) > 1:
+                new_playlist = new_playlist[1:] + [new_playlist[0]]
+        
+        # Update player's playlist
+        session.playlist = new_playlist
+        session.current = 0
+        session.autoplay_next = True
+        
+        # Log what we've picked
+        new_titles = []
+        for f in session.playlist[:3]:
+            tags = player.tags_cache.get(f, {})
+            new_titles.append(tags.get('title', os.path.basename(f)))
+        
+        print(f"Previous first songs: {current_titles}")
+        print(f"New first songs: {new_titles}")
+
+async def playlist_rows(session):
+    """playlist_items(session) built on the I/O pool (tags, SQLite, cover lookups) unless already built."""
+    version, items = session._items
+    if version == playlist_stamp(session):
+        return items
+    return await io_executor.run(playlist_items, session)
 
 # API: /playlist - returns all songs with metadata, lyrics, and cover art URL
 @app.get("/playlist")
@@ -1262,6 +1631,8 @@ async def playlist_api(request: Request):
     # Import modules needed within this function
     import time
     import random
+    # Each browser has its own playlist, picked by its session cookie
+    session, new_token = request_session(request)
     # Check query parameters for any refresh indicators
     params = request.query_params
     force_refresh = params.get('nocache') or params.get('force_refresh') or params.get('ts')
@@ -1270,85 +1641,27 @@ async def playlist_api(request: Request):
     
     # Only generate a new playlist if explicitly requested
     if generate_new:
-        print(f"Server received forced playlist refresh with parameter: {force_refresh}")
-        
-        # Generate truly fresh random playlist
-        import random
-        import time
-        
-        # Use a different seed each time
-        random_seed = int(time.time() * 1000000) + random.randint(1, 1000000)
-        random.seed(random_seed)
-        print(f"Using random seed: {random_seed}")
-        
-        # Get all audio files and randomly select some
-        all_files = player.audio_files.copy()
-        if all_files:
-            random.shuffle(all_files)
-            n = min(len(all_files), 10)  # Default to 10 songs
-            
-            # Get current playlist titles for comparison
-            current_titles = []
-            if player.playlist:
-                for f in player.playlist[:3]:
-                    tags = player.tags_cache.get(f, {}) 
-                    current_titles.append(tags.get('title', os.path.basename(f)))
-            
-            # Generate new playlist
-            new_playlist = all_files[:n]
-            
-            # Check if first song is the same, if so, shift the playlist
-            if player.playlist and new_playlist and player.playlist[0] == new_playlist[0]:
-                print("First song is the same - shifting playlist")
-                if len(new_playlist) > 1:
-                    new_playlist = new_playlist[1:] + [new_playlist[0]]
-            
-            # Update player's playlist
-            player.playlist = new_playlist
-            player.current = 0
-            player.autoplay_next = True
-            
-            # Log what we've picked
-            new_titles = []
-            for f in player.playlist[:3]:
-                tags = player.tags_cache.get(f, {})
-                new_titles.append(tags.get('title', os.path.basename(f)))
-            
-            print(f"Previous first songs: {current_titles}")
-            print(f"New first songs: {new_titles}")
+        # Copies and shuffles the whole library, so it runs off the event loop
+        await cpu_executor.run(shuffle_new_playlist, session, force_refresh)
     
+    # Unchanged since the client's copy: answer 304 without building anything.
+    # A pending autoplay is part of the tag, so the flag is always delivered.
+    playlist_version = session.playlist_version
+    version = playlist_stamp(session)
+    autoplay = session.autoplay_next
+    etag = f'W/"{version}{"-autoplay" if autoplay else ""}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return with_session_cookie(Response(status_code=304, headers=headers), new_token)
+
     # Create playlist data
-    playlist = []
-    for idx, f in enumerate(player.playlist):
-        tags = player.tags_cache.get(f) or get_tags(f)
-        title = tags.get('title', os.path.basename(f))
-        artist = tags.get('artist', '')
-        album = tags.get('album', '')
-        year = tags.get('year', '')
-        genres = tags.get('genres', [])
-        lyrics = tags.get('lyrics', '') or tags.get('lyric', '')
-        cover_url = None
-        cover_path = get_cover_path(f)
-        if cover_path:
-            cover_url = f"/cover/{idx}"
-        playlist.append({
-            "index": idx,
-            "title": title,
-            "artist": artist,
-            "album": album,
-            "year": year,
-            "genres": genres,
-            "audio_url": f"/audio/{idx}?cache={int(time.time() * 1000 + random.randint(1, 10000))}",
-            "lyrics_url": f"/lyrics/{idx}",
-            "cover_url": cover_url
-        })
+    playlist = await playlist_rows(session)
     
     # Check if we need to autoplay and reset the flag ONLY when it's consumed
     # This ensures the autoplay flag persists until the client actually uses it
-    autoplay = player.autoplay_next
     
     # Add the current index to help the player know which song to play
-    current_idx = player.current
+    current_idx = session.current
     
     # Get the autoplay state and create a unique signature for this playlist
     # This helps the frontend track if this is a genuinely new playlist or just a refresh
@@ -1365,76 +1678,128 @@ async def playlist_api(request: Request):
         "playlist": playlist,
         "autoplay": autoplay,
         "current": current_idx,
-        "signature": playlist_signature
+        "signature": playlist_signature,
+        # The playlist version alone: the player compares it with the one /events sends
+        "version": playlist_version
     }
     
     # Only reset the autoplay flag AFTER creating the response
     if autoplay:
-        player.autoplay_next = False  # Reset the flag after sending it
+        session.autoplay_next = False  # Reset the flag after sending it
     
-    return JSONResponse(response)
+    return with_session_cookie(JSONResponse(response, headers=headers), new_token)
+
+# API: /events - server-sent events with the playlist version, current index and autoplay flag
+@app.get("/events")
+async def events_api(request: Request):
+    # Sent on connect and after every playlist/current change; the page then fetches /playlist
+    session, new_token = request_session(request)
+    response = StreamingResponse(session.events.stream(request, session.playlist_state()),
+                                 media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    return with_session_cookie(response, new_token)
 
 # API: /audio/{idx} - serves audio file by playlist index
 @app.get("/audio/{idx}")
-def audio_file(idx: int):
+def audio_file(idx: int, request: Request):
+    # Read-only: requests without a session cookie must not create (and evict) sessions
+    session = cookie_session(request)
     try:
-        f = player.playlist[idx]
-        ext = os.path.splitext(f)[1].lower()
-        mime = mimetypes.types_map.get(ext, "audio/mpeg")
-        
-        # Custom response handling to suppress connection reset errors
-        try:
-            # Create response with anti-caching headers
-            response = FileResponse(f, media_type=mime, filename=os.path.basename(f))
-            # Add cache control headers to prevent caching
-            response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
-            response.headers["Pragma"] = "no-cache"
-            response.headers["Expires"] = "0"
-            # Add a timestamp to make each response unique
-            response.headers["X-Timestamp"] = str(time.time())
-            return response
-        except ConnectionResetError:
-            # Client disconnected, just return a normal response
-            # This prevents the error from showing in the logs
-            return Response(status_code=200)
-        except Exception as e:
-            # Log other errors but don't show stack trace
-            print(f"Error serving audio file: {str(e)}")
-            return Response(status_code=500)
-            
+        f = session.playlist[idx]
     except IndexError:
         # Playlist index out of range
         return Response(status_code=404)
-    except Exception as e:
-        # Any other exception
-        print(f"Unexpected error in audio_file: {str(e)}")
-        return Response(status_code=500)
+    # Index URLs change meaning with every pick; send clients to the track's stable URL
+    url = track_audio_url(f)
+    if url:
+        extra = {k: v for k, v in request.query_params.items() if k in ("format", "bitrate")}
+        if extra:
+            url += ("&" if "?" in url else "?") + urlencode(extra)
+        return RedirectResponse(url, status_code=307)
+    return file_response(request, f, audio_media_type(f), cache_control="no-cache")
+
+# API: /tracks/{track_id}/audio?v=<fingerprint>[&format=opus&bitrate=128] - serves a track by
+# catalog id, with byte ranges; with format, transcoded by ffmpeg for slow connections
+@app.api_route("/tracks/{track_id}/audio", methods=["GET", "HEAD"])
+async def track_audio(track_id: int, request: Request, fmt: str = Query(None, alias="format"),
+                      bitrate: int = DEFAULT_BITRATE):
+    catalog = player.catalog
+    f = catalog.path_of(track_id) if 0 <= track_id < len(catalog.paths) else None
+    if f is None:
+        return Response(status_code=404)
+    # The fingerprint in the URL changes with the file, so such URLs can be cached for good,
+    # but only if it is this file's: ids are reassigned after clearing the cache or a restart
+    v = request.query_params.get("v")
+    cache_control = "no-cache"
+    if v:
+        fingerprint = await io_executor.run(track_store.fingerprint, f)
+        if fingerprint is not None and v == fingerprint_version(fingerprint):
+            cache_control = IMMUTABLE
+    if fmt:
+        if fmt not in FORMATS:
+            return JSONResponse({"error": f"Unknown format {fmt!r}"}, status_code=400)
+        if transcoder.available:
+            bitrate = clamp_bitrate(bitrate)
+            try:
+                fingerprint = await io_executor.run(file_fingerprint, f)
+            except OSError:
+                return Response(status_code=404)
+            key = transcoder.key(f, fingerprint, fmt, bitrate)
+            cached = await io_executor.run(transcoder.cached, key, fmt)
+            if cached:
+                return await io_executor.run(file_response, request, cached, transcoder.media_type(fmt),
+                                             cache_control=cache_control)
+            # Streamed while ffmpeg encodes; no length or ranges until the result is cached
+            headers = {"Cache-Control": "no-cache", "Accept-Ranges": "none"}
+            if request.method == "HEAD":
+                return Response(headers=headers, media_type=transcoder.media_type(fmt))
+            try:
+                # Waits for the first chunk, so a failing ffmpeg still gets an error status
+                chunks = await transcoder.open(f, key, fmt, bitrate)
+            except TranscodeError:
+                return JSONResponse({"error": "Transcoding failed"}, status_code=502)
+            except TranscoderBusy:
+                return JSONResponse({"error": "transcoder is busy"}, status_code=503, headers={"Retry-After": "1"})
+            return StreamingResponse(chunks, headers=headers, media_type=transcoder.media_type(fmt))
+        print("[WARNING] ffmpeg not found; sending the original file")
+    return await io_executor.run(file_response, request, f, audio_media_type(f), cache_control=cache_control)
 
 # API: /lyrics/{idx} - returns lyrics for song (try cache, else fetch)
 @app.get("/lyrics/{idx}")
-def lyrics_api(idx: int):
+async def lyrics_api(idx: int, request: Request):
+    session = cookie_session(request)
     try:
-        f = player.playlist[idx]
-        tags = player.tags_cache.get(f) or get_tags(f)
+        f = session.playlist[idx]
+        # A tag read may hit a slow disk; not on the event loop
+        tags = await io_executor.run(track_tags, f)
         artist = tags.get('artist', '')
         title = tags.get('title', os.path.basename(f))
         lyrics = tags.get('lyrics', '') or tags.get('lyric', '')
         if not lyrics and artist and title:
-            lyrics = fetch_lyrics(artist, title)
+            # Awaited on the lyrics pool; no server worker thread is held meanwhile
+            lyrics = await lyrics_service.get_async(artist, title)
+        prefetch_lyrics(idx + 1, session)
         return JSONResponse({"lyrics": lyrics or ""})
     except Exception:
         return JSONResponse({"lyrics": ""})
 
-# API: /cover/{idx} - serves cover art image if found
+# API: /cover/{idx}?size=300 - serves a pre-sized JPEG of the cover art if found
 @app.get("/cover/{idx}")
-def cover_api(idx: int):
+async def cover_api(idx: int, request: Request, size: int = THUMBNAIL_SIZES[-1]):
+    session = cookie_session(request)
     try:
-        f = player.playlist[idx]
-        cover_path = get_cover_path(f)
-        if cover_path:
-            ext = os.path.splitext(cover_path)[1].lower()
-            mime = mimetypes.types_map.get(ext, "image/jpeg")
-            return FileResponse(cover_path, media_type=mime)
+        f = session.playlist[idx]
+        key, load = await io_executor.run(cover_source, f)
+        # Smallest rendition that is at least as large as requested
+        size = next((s for s in THUMBNAIL_SIZES if s >= size), THUMBNAIL_SIZES[-1])
+        # Lookups touch the disk (utime, exists), so they run on the io pool too
+        thumb = await io_executor.run(thumbnail_cache.get, key, size)
+        if thumb is None and not await io_executor.run(thumbnail_cache.has_no_image, key):
+            # Decoded and resized once per cover image on the thumbnail pool
+            if await asyncio.wrap_future(thumbnail_cache.submit(key, load)):
+                thumb = await io_executor.run(thumbnail_cache.get, key, size)
+        if thumb:
+            return FileResponse(thumb, media_type="image/jpeg")
     except Exception:
         pass
     return Response(status_code=404)
@@ -1446,33 +1811,12 @@ async def pick_songs_api(request: Request):
     data = await request.json()
     count = data.get("count", 10)
     genres = data.get("genres")
-    # Call the existing pick_songs function
-    pick_songs(count, genres)
+    # Call the existing pick_songs function on the caller's playlist
+    session, new_token = request_session(request)
+    # Sampling walks the catalog, so it runs on the CPU pool like the row building on the I/O pool
+    await cpu_executor.run(pick_songs, count, genres, session=session)
     # Return the new playlist (same format as /playlist)
-    playlist = []
-    for idx, f in enumerate(player.playlist):
-        tags = player.tags_cache.get(f) or get_tags(f)
-        title = tags.get('title', os.path.basename(f))
-        artist = tags.get('artist', '')
-        album = tags.get('album', '')
-        year = tags.get('year', '')
-        genres = tags.get('genres', [])
-        cover_url = None
-        cover_path = get_cover_path(f)
-        if cover_path:
-            cover_url = f"/cover/{idx}"
-        playlist.append({
-            "index": idx,
-            "title": title,
-            "artist": artist,
-            "album": album,
-            "year": year,
-            "genres": genres,
-            "audio_url": f"/audio/{idx}?cache={int(time.time() * 1000 + random.randint(1, 10000))}",
-            "lyrics_url": f"/lyrics/{idx}",
-            "cover_url": cover_url
-        })
-    return JSONResponse(playlist)
+    return with_session_cookie(JSONResponse(await playlist_rows(session)), new_token)
 
 # Mount Gradio UI at /gradio
 app = gr.mount_gradio_app(app, demo, path="/gradio")
@@ -1585,13 +1929,14 @@ def create_web_interface():
                     outputs=[song_count_text, genre_dropdown, status_text]
                 )
                 update_genre_btn.click(
-                    fn=lambda genres: f"Total songs found: {len(player.filter_by_genre(genres))}",
+                    fn=apply_genre_filter,
                     inputs=[genre_dropdown],
                     outputs=[song_count_text]
                 )
                 # Connect the Pick songs button - simple pre-LLM style
-                def pick_and_update_table_web(n, genres):
+                def pick_and_update_table_web(n, genres, request: gr.Request):
                     # Simple function like before LLM integration
+                    session = gradio_session(request)
                     if not n:
                         n = 10
                     try:
@@ -1600,7 +1945,7 @@ def create_web_interface():
                         n = 10
                     
                     # Set autoplay flag
-                    player.autoplay_next = True
+                    session.autoplay_next = True
                     
                     # Ensure we're using completely randomized selection with unique songs
                     import random
@@ -1617,14 +1962,14 @@ def create_web_interface():
                     
                     # Apply genre filtering if needed
                     if genres:
-                        filtered = [f for f in all_files if any(g in player.tags_cache.get(f, {}).get('genres', []) for g in genres)]
+                        filtered = player.files_with_genres(genres)
                     else:
                         filtered = all_files
                     
                     # Make sure we have enough songs
                     if not filtered:
                         print("No songs match the selected genres")
-                        return player.get_playlist_table(), ""
+                        return session.get_playlist_table(), ""
                     
                     # Create a truly random order by sorting with a random key
                     filtered.sort(key=lambda _: random.random())
@@ -1636,7 +1981,7 @@ def create_web_interface():
                         selected_songs = filtered[:n]
                     
                     # Double-check we're not accidentally picking the same songs
-                    current_titles = [player.tags_cache.get(song, {}).get('title', 'Unknown') for song in player.playlist]
+                    current_titles = [player.tags_cache.get(song, {}).get('title', 'Unknown') for song in session.playlist]
                     new_titles = [player.tags_cache.get(song, {}).get('title', 'Unknown') for song in selected_songs]
                     
                     print(f"Current playlist: {current_titles[:3]}")
@@ -1649,13 +1994,13 @@ def create_web_interface():
                         filtered.sort(key=lambda _: random.random())
                         selected_songs = filtered[:n] if len(filtered) > n else filtered.copy()
                     
-                    # Update the player's playlist
-                    player.playlist = selected_songs
-                    player.current = 0
+                    # Update the session's playlist
+                    session.playlist = selected_songs
+                    session.current = 0
                     
                     # Print to server log to verify we're getting different songs
-                    print(f"Selected {len(player.playlist)} random songs:")
-                    for i, song in enumerate(player.playlist[:3]):
+                    print(f"Selected {len(session.playlist)} random songs:")
+                    for i, song in enumerate(session.playlist[:3]):
                         title = player.tags_cache.get(song, {}).get('title', 'Unknown')
                         print(f"  {i+1}. {title}")
                     
@@ -1683,7 +2028,7 @@ def create_web_interface():
                     '''
                     
                     # Return new playlist table and refresh script
-                    return player.get_playlist_table(), gr.update(value=js_code)
+                    return session.get_playlist_table(), gr.update(value=js_code)
                 
                 autoplay_script_web = gr.HTML(visible=True)
                 
@@ -1705,7 +2050,8 @@ def create_web_interface():
                 with gr.Row():
                     chat_status_web = gr.Markdown("")
                 
-                def chat_and_pick_songs_web(message, history):
+                def chat_and_pick_songs_web(message, history, request: gr.Request):
+                    session = gradio_session(request)
                     # Check if OpenRouter integration is available
                     if parse_genre_request is None:
                         return history + [{"role": "assistant", "content": "OpenRouter integration is not available. Please make sure openrouter_utils.py is in the same directory."}], ""
@@ -1738,7 +2084,8 @@ def create_web_interface():
                         
                         # Pick by duration if specified, otherwise by count
                         if duration:
-                            pick_songs_by_duration(duration, selected_genres, year_start, year_end, title_keywords, album_filters)
+                            achieved = pick_songs_by_duration(duration, selected_genres, year_start, year_end, title_keywords, album_filters,
+                                                              session=session)
                             yr_text = ""
                             if year_start and year_end:
                                 yr_text = f" between {year_start} and {year_end}"
@@ -1746,9 +2093,10 @@ def create_web_interface():
                                 yr_text = f" from {year_start} onward"
                             elif year_end:
                                 yr_text = f" up to {year_end}"
-                            response = f"Playing ~{duration} minutes of {', '.join(selected_genres)} songs{yr_text}. The music will start momentarily."
+                            response = f"Playing {round(achieved / 60)} minutes (asked for {duration}) of {', '.join(selected_genres)} songs{yr_text}. The music will start momentarily."
                         else:
-                            pick_songs_by_filters(num_songs, selected_genres, title_keywords, album_filters, year_start, year_end)
+                            pick_songs_by_filters(num_songs, selected_genres, title_keywords, album_filters, year_start, year_end,
+                                                  session=session)
                             response = f"Playing {num_songs} songs from filters: {', '.join(selected_genres)}{(' with titles '+', '.join(title_keywords)) if title_keywords else ''}{(' from albums '+', '.join(album_filters)) if album_filters else ''}. The music will start momentarily."
                         
                         return new_history, "", gr.update(value=f"<script>setTimeout(function() {{ console.log('Refreshing player...'); window.location.reload(); }}, 1000);</script>")
@@ -1794,7 +2142,7 @@ app = gr.mount_gradio_app(app, web_interface, path="/web")
 
 # Create an endpoint for direct playlist refresh without needing iframe messaging
 @app.get("/direct-refresh-playlist")
-async def direct_refresh_playlist(autoplay: bool = True, api: str = "web"):
+async def direct_refresh_playlist(request: Request, autoplay: bool = True, api: str = "web"):
     """Endpoint that directly refreshes the player by redirecting to the player page
     
     Parameters:
@@ -1803,8 +2151,8 @@ async def direct_refresh_playlist(autoplay: bool = True, api: str = "web"):
     """
     # Set the autoplay flag in the player's data cache to ensure it starts playing
     # This ensures both APIs can trigger autoplay
-    if hasattr(player, 'autoplay_next'):
-        player.autoplay_next = autoplay
+    session, new_token = request_session(request)
+    session.autoplay_next = autoplay
     
     # Log the refresh request
     print(f"Direct refresh requested: autoplay={autoplay}, api={api}, time={int(time.time())}")
@@ -1825,7 +2173,7 @@ async def direct_refresh_playlist(autoplay: bool = True, api: str = "web"):
     </body>
     </html>
     """
-    return Response(content=html_content, media_type="text/html")
+    return with_session_cookie(Response(content=html_content, media_type="text/html"), new_token)
 
 # Inject favicon using custom HTML
 favicon_html = """
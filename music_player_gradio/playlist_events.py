@@ -0,0 +1,72 @@
+import json
+import asyncio
+import threading
+
+# Server-sent events for the web player. The player publishes an event
+# whenever its playlist or current song changes (from any thread); every
+# connected /events stream gets it on its own event loop, so pages only
+# fetch /playlist when something actually changed instead of polling it.
+# Live library updates are announced the same way as "library" events.
+
+KEEPALIVE_SECONDS = 15
+RETRY_MS = 3000  # How long EventSource waits before reconnecting
+QUEUE_SIZE = 16
+
+
+class PlaylistEvents:
+    """Thread-safe fan-out of playlist change events to asyncio subscribers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # asyncio.Queue -> its event loop
+
+    def subscribe(self):
+        """New queue receiving every published event; call from the event loop."""
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def publish(self, event, name="playlist"):
+        """Send event to every subscriber; safe to call from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, (name, event))
+            except RuntimeError:
+                self.unsubscribe(queue)  # Its loop is closed
+
+    @staticmethod
+    def _deliver(queue, event):
+        # A slow client only needs the newest state; drop the oldest event
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    async def stream(self, request, initial):
+        """SSE body for one client: the initial playlist state, then one event per change."""
+        queue = self.subscribe()
+        try:
+            yield f"retry: {RETRY_MS}\n"
+            yield format_event("playlist", initial)
+            while not await request.is_disconnected():
+                try:
+                    name, event = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"  # Keeps proxies from closing an idle stream
+                    continue
+                yield format_event(name, event)
+        finally:
+            self.unsubscribe(queue)
+
+
+def format_event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
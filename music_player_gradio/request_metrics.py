@@ -0,0 +1,103 @@
+import time
+import bisect
+import threading
+
+# Per-endpoint latency histograms for the HTTP API. The middleware times
+# each request from arrival until its response headers are sent (for
+# streams like /events that is the time to the first byte, not the length
+# of the stream) and files it under the route's path template, so
+# /cover/3 and /cover/7 count as one endpoint. Percentiles are read from
+# fixed log-spaced buckets: exact enough to compare p99 between builds,
+# with constant memory however many requests are served.
+
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """Request count, sum, max and bucket counts of one endpoint's latencies."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)  # The last bucket is everything slower
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile, never above the largest latency seen."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(float(BUCKETS_MS[i]), self.max_ms) if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self):
+        buckets = {f"<={b}": n for b, n in zip(BUCKETS_MS, self.counts)}
+        buckets[f">{BUCKETS_MS[-1]}"] = self.counts[-1]
+        return {"count": self.count, "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+                "p50_ms": self.percentile(50), "p90_ms": self.percentile(90), "p99_ms": self.percentile(99),
+                "max_ms": round(self.max_ms, 3), "buckets": buckets}
+
+
+class RequestMetrics:
+    """Latency histograms keyed by "METHOD /route/{template}"."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def record(self, endpoint, ms):
+        with self._lock:
+            histogram = self._histograms.get(endpoint)
+            if histogram is None:
+                histogram = self._histograms[endpoint] = LatencyHistogram()
+            histogram.add(ms)
+
+    def summary(self):
+        with self._lock:
+            return {endpoint: h.summary() for endpoint, h in sorted(self._histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+class LatencyMiddleware:
+    """ASGI middleware timing every routed HTTP request into a RequestMetrics."""
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        recorded = False
+
+        async def timed_send(message):
+            nonlocal recorded
+            if message["type"] == "http.response.start" and not recorded:
+                recorded = True
+                self._record(scope, start)
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
+
+    def _record(self, scope, start):
+        # The router stores the matched route in the (shared) scope; unmatched paths are not kept
+        route = scope.get("route")
+        path = getattr(route, "path", None)
+        if path is None:
+            return
+        endpoint = f"{scope['method']} {scope.get('root_path', '')}{path}"
+        self.metrics.record(endpoint, (time.perf_counter() - start) * 1000)
@@ -0,0 +1,73 @@
+import time
+import secrets
+import threading
+from collections import OrderedDict
+
+# Listener sessions for the web player. Every browser gets its own playlist,
+# cursor and autoplay flag, keyed by a random token in a cookie, while the
+# scanned library (catalog, genre index, tags) stays shared and read-only.
+# Sessions are kept least recently used first; idle ones and the oldest
+# beyond max_sessions are dropped, so memory stays bounded however many
+# clients come and go. A session with an open /events stream is never idle.
+
+SESSION_COOKIE = "rmp_session"
+DEFAULT_MAX_SESSIONS = 256
+DEFAULT_IDLE_SECONDS = 6 * 60 * 60
+
+
+class SessionStore:
+    """Sessions by token with LRU and idle eviction; factory() makes a new session."""
+
+    def __init__(self, factory, max_sessions=DEFAULT_MAX_SESSIONS, idle_seconds=DEFAULT_IDLE_SECONDS,
+                 in_use=None):
+        self.factory = factory
+        self.max_sessions = max(1, max_sessions)
+        self.idle_seconds = idle_seconds
+        self.in_use = in_use  # in_use(session) -> True keeps it from being evicted
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # token -> (session, last used)
+
+    def get(self, token):
+        """The session for token, or None if it is unknown or was evicted."""
+        if not token:
+            return None
+        with self._lock:
+            entry = self._sessions.get(token)
+            if entry is None:
+                return None
+            self._sessions[token] = (entry[0], time.monotonic())
+            self._sessions.move_to_end(token)
+            return entry[0]
+
+    def get_or_create(self, token):
+        """(token, session, created); a new token is issued if token is unknown."""
+        session = self.get(token)
+        if session is not None:
+            return token, session, False
+        session = self.factory()
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._evict()
+            self._sessions[token] = (session, time.monotonic())
+        return token, session, True
+
+    def values(self):
+        """Snapshot of the live sessions, e.g. to notify all of them."""
+        with self._lock:
+            return [session for session, _ in self._sessions.values()]
+
+    def _evict(self):
+        # Makes room for one more session
+        now = time.monotonic()
+        for token, (session, last_used) in list(self._sessions.items()):
+            over = len(self._sessions) >= self.max_sessions
+            if not over and now - last_used < self.idle_seconds:
+                break  # Everything after this one was used more recently
+            if self.in_use is not None and self.in_use(session):
+                self._sessions[token] = (session, now)
+                self._sessions.move_to_end(token)
+                continue
+            del self._sessions[token]
+
+    def __len__(self):
+        return len(self._sessions)
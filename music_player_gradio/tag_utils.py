@@ -0,0 +1,96 @@
+import re
+from mutagen import File
+from mutagen.flac import FLAC
+
+# Tag reading lives in its own module (no Gradio/FastAPI imports) so the
+# library scanner can run it inside worker processes.
+
+# MP3 tags are keyed by ID3 frame id; these are looked up under the names
+# FLAC/Vorbis comments use
+ID3_FRAME_NAMES = {'tit2': 'title', 'tpe1': 'artist', 'talb': 'album', 'tdrc': 'date', 'tyer': 'year'}
+# Version of what get_tags reads; stored MP3 rows of an older reader are read again
+TAG_READER_VERSION = 2
+
+
+def _key_name(key):
+    key = key.lower()
+    return ID3_FRAME_NAMES.get(key, key)
+
+
+def get_tags(filepath):
+    try:
+        audio = File(filepath)
+    except Exception as e:
+        # print(f"Error reading file: {e}")
+        return {'genres': []}
+    tags = {}
+    if audio is None or not hasattr(audio, 'tags') or audio.tags is None:
+        tags['genres'] = []
+        return tags
+    all_keys = list(audio.tags.keys()) if hasattr(audio.tags, 'keys') else []
+    genres = []
+    # Look for 'genre', 'GENRE', and 'TCON' (case-insensitive)
+    for key in all_keys:
+        if key.lower() in ('genre', 'tcon'):
+            val = audio.tags[key]
+            # Handle both list and string
+            if isinstance(val, list):
+                for v in val:
+                    genres.extend([g.strip() for g in re.split(r'[;|,/\\>\-]+', str(v)) if g.strip()])
+            else:
+                genres.extend([g.strip() for g in re.split(r'[;|,/\\>\-]+', str(val)) if g.strip()])
+    tags['genres'] = genres
+    if genres:
+        tags['genre'] = genres[0]
+    # Get other tags
+    for tag in ["title", "artist", "album", "lyrics", "lyric"]:
+        for key in all_keys:
+            if _key_name(key) == tag:
+                v = audio.tags[key]
+                tags[tag] = str(v[0]) if isinstance(v, list) else str(v)
+    # Only whether there is art; the picture is read when a thumbnail is built
+    tags['has_cover'] = _embedded_cover(audio) is not None
+
+    # Add duration and year metadata
+    try:
+        if hasattr(audio, 'info') and hasattr(audio.info, 'length'):
+            tags['duration'] = int(audio.info.length)
+        for key in all_keys:
+            if _key_name(key) in ('date', 'year'):
+                val = audio.tags[key]
+                year_str = val[0] if isinstance(val, list) else val
+                try:
+                    # Try to extract a valid year from the string
+                    year_value = int(str(year_str)[:4])
+                    # Only use years that make sense (roughly 1900-2100)
+                    if 1900 <= year_value <= 2100:
+                        tags['year'] = year_value
+                except (ValueError, TypeError):
+                    # If we can't parse the year, don't set it
+                    pass
+                break
+                
+    except Exception:
+        pass
+
+    return tags
+
+
+def _embedded_cover(audio):
+    if isinstance(audio, FLAC):
+        return audio.pictures[0].data if audio.pictures else None
+    for key in audio.tags.keys():
+        if key.startswith('APIC'):
+            return audio.tags[key].data
+    return None
+
+
+def read_embedded_cover(filepath):
+    """Return the embedded cover picture bytes of an audio file, or None."""
+    try:
+        audio = File(filepath)
+    except Exception:
+        return None
+    if audio is None or getattr(audio, 'tags', None) is None:
+        return None
+    return _embedded_cover(audio)
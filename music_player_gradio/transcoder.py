@@ -0,0 +1,264 @@
+import os
+import shutil
+import asyncio
+import hashlib
+import threading
+
+# On-the-fly transcoding for listeners on slow links. A track is piped
+# through a local ffmpeg and streamed to the client while it is encoded; the
+# finished output is kept in a size-capped disk cache (least recently used
+# files are evicted), so the next request for it is served as a plain file
+# with byte ranges. At most max_concurrent ffmpeg processes run at a time,
+# and concurrent requests for the same rendition share one of them. A job
+# whose last listener disconnects is cancelled (ffmpeg is killed and nothing
+# is cached), so skipping through tracks does not queue full transcodes; at
+# most max_queued more jobs wait for a slot, beyond that open() raises
+# TranscoderBusy.
+
+FORMATS = {
+    # format: (ffmpeg encoder arguments, container, media type, file extension)
+    "opus": (["-c:a", "libopus"], "ogg", "audio/ogg", ".opus"),
+    "mp3": (["-c:a", "libmp3lame"], "mp3", "audio/mpeg", ".mp3"),
+    "aac": (["-c:a", "aac"], "adts", "audio/aac", ".aac"),
+}
+DEFAULT_BITRATE = 128
+MIN_BITRATE, MAX_BITRATE = 32, 320
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+DEFAULT_MAX_CONCURRENT = 2
+DEFAULT_MAX_QUEUED = 4
+CHUNK_SIZE = 64 * 1024
+
+
+class TranscodeError(Exception):
+    """ffmpeg failed before producing any output."""
+
+
+class TranscoderBusy(Exception):
+    """max_concurrent jobs are running and max_queued more are waiting."""
+
+
+def clamp_bitrate(bitrate):
+    try:
+        bitrate = int(bitrate)
+    except (TypeError, ValueError):
+        return DEFAULT_BITRATE
+    return max(MIN_BITRATE, min(bitrate, MAX_BITRATE))
+
+
+class Transcoder:
+    """ffmpeg transcodes streamed as they are produced, with an LRU disk cache of finished ones."""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, max_concurrent=DEFAULT_MAX_CONCURRENT,
+                 max_queued=DEFAULT_MAX_QUEUED, ffmpeg=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.ffmpeg = ffmpeg or shutil.which("ffmpeg")
+        self._semaphore = None  # Created on the server's event loop
+        self._lock = threading.Lock()
+        self._total = None  # Bytes on disk, counted on the first write
+        self._jobs = {}  # Cache key -> _Job in flight; concurrent requests for one rendition share it
+
+    @property
+    def available(self):
+        return self.ffmpeg is not None
+
+    def media_type(self, fmt):
+        return FORMATS[fmt][2]
+
+    def key(self, path, fingerprint, fmt, bitrate):
+        """Cache key of one rendition; a changed file gets a new key."""
+        return hashlib.sha1(f"{path}\n{fingerprint}\n{fmt}\n{bitrate}".encode("utf-8")).hexdigest()
+
+    def path(self, key, fmt):
+        return os.path.join(self.cache_dir, key[:2], key + FORMATS[fmt][3])
+
+    def cached(self, key, fmt):
+        """Path of a finished transcode, or None. A hit counts as a use for the LRU."""
+        path = self.path(key, fmt)
+        try:
+            os.utime(path)
+            return path
+        except OSError:
+            return None
+
+    def _command(self, source, fmt, bitrate):
+        encoder, container, _, _ = FORMATS[fmt]
+        return [self.ffmpeg, "-nostdin", "-loglevel", "error", "-i", source, "-map", "0:a:0", "-vn",
+                *encoder, "-b:a", f"{bitrate}k", "-f", container, "pipe:1"]
+
+    async def open(self, source, key, fmt, bitrate):
+        """Start the transcode of key, or join the one in flight, and wait for its first chunk.
+
+        Returns an async iterator over the whole output. Raises TranscodeError
+        when ffmpeg fails before producing anything, TranscoderBusy when too
+        many jobs are running or queued.
+        """
+        job = self._jobs.get(key)
+        if job is None or job.cancelled:
+            if len(self._jobs) >= self.max_concurrent + self.max_queued:
+                raise TranscoderBusy()
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            job = self._jobs[key] = _Job()
+            # Shared by every request for key; cancelled when the last of them is gone
+            job.task = asyncio.get_running_loop().create_task(self._run(job, source, key, fmt, bitrate))
+        job.readers += 1
+        try:
+            await job.wait(1)
+        except asyncio.CancelledError:
+            job.leave()  # Client gone before the first chunk
+            raise
+        if not job.chunks and not job.ok:
+            job.leave()
+            raise TranscodeError(f"Could not transcode {source}")
+        return job.read()
+
+    async def _run(self, job, source, key, fmt, bitrate):
+        final = self.path(key, fmt)
+        tmp = f"{final}.{os.urandom(4).hex()}.tmp"
+        ok = False
+        try:
+            async with self._semaphore:
+                # File work goes to a thread; only the pipe is read on the event loop
+                out = await asyncio.to_thread(self._open_tmp, tmp)
+                try:
+                    proc = await asyncio.create_subprocess_exec(
+                        *self._command(source, fmt, bitrate), stdin=asyncio.subprocess.DEVNULL,
+                        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+                    try:
+                        while True:
+                            chunk = await proc.stdout.read(CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            await asyncio.to_thread(out.write, chunk)
+                            job.add(chunk)
+                        ok = await proc.wait() == 0
+                    finally:
+                        if proc.returncode is None:
+                            proc.kill()
+                finally:
+                    out.close()
+            if not ok:
+                print(f"[WARNING] ffmpeg failed ({proc.returncode}) on {source}")
+            await asyncio.to_thread(self._finish, tmp, final, ok)
+        except Exception as e:
+            ok = False
+            print(f"[WARNING] Could not transcode {source}: {e}")
+            _remove(tmp)
+        except asyncio.CancelledError:
+            _remove(tmp)  # Server shutdown
+            raise
+        finally:
+            # Removed only once the output is in the cache, so later requests find it there
+            if self._jobs.get(key) is job:
+                del self._jobs[key]
+            job.finish(ok)
+
+    def _open_tmp(self, tmp):
+        os.makedirs(os.path.dirname(tmp), exist_ok=True)
+        return open(tmp, "wb")
+
+    def _finish(self, tmp, final, ok):
+        if ok:
+            os.replace(tmp, final)
+            self._account(os.path.getsize(final))
+        else:
+            _remove(tmp)
+
+    def _account(self, written):
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._files())
+            else:
+                self._total += written
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _files(self):
+        for dirpath, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith(".tmp"):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def _evict(self):
+        # Drop least recently used transcodes until 90% of the cap is left
+        files = sorted(self._files(), key=lambda item: item[2])
+        self._total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        for path, size, _ in files:
+            if self._total <= target:
+                break
+            try:
+                os.remove(path)
+                self._total -= size
+            except OSError:
+                pass
+
+
+class _Job:
+    """Output of one ffmpeg run, kept in memory while it runs so every listener gets all of it."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.ok = False
+        self.task = None
+        self.readers = 0
+        self.cancelled = False
+        self._wakeup = asyncio.Event()
+
+    def add(self, chunk):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, ok):
+        self.ok = ok
+        self.done = True
+        self._notify()
+
+    def _notify(self):
+        wakeup, self._wakeup = self._wakeup, asyncio.Event()
+        wakeup.set()
+
+    async def wait(self, count):
+        """Until at least count chunks are there or the job is done."""
+        while len(self.chunks) < count and not self.done:
+            await self._wakeup.wait()
+
+    async def read(self):
+        """The output from the start; the reader was counted by Transcoder.open."""
+        try:
+            i = 0
+            while True:
+                await self.wait(i + 1)
+                if i >= len(self.chunks):
+                    return
+                yield self.chunks[i]
+                i += 1
+        finally:
+            self.leave()
+
+    def leave(self):
+        self.readers -= 1
+        if not self.readers:
+            # Nobody is listening any more; stop ffmpeg instead of finishing for the cache
+            self.cancel()
+
+    def cancel(self):
+        if not self.done:
+            self.cancelled = True
+            self.task.cancel()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
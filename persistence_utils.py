@@ -1,9 +1,38 @@
 import os
 import json
 import pickle
+import threading
 
 FOLDERS_FILE = os.path.join(os.path.dirname(__file__), 'selected_folders.json')
 TAGS_CACHE_FILE = os.path.join(os.path.dirname(__file__), 'tags_cache.pkl')
+COVERS_DIR = os.path.join(os.path.dirname(__file__), 'covers')
+THUMBNAILS_DIR = os.path.join(os.path.dirname(__file__), 'thumbnails')
+LYRICS_DIR = os.path.join(os.path.dirname(__file__), 'lyrics')
+FINGERPRINTS_FILE = os.path.join(os.path.dirname(__file__), 'scan_fingerprints.pkl')
+
+# The cover store, thumbnail cache and lyrics service are built on first use,
+# so scan worker processes importing this module do not start their pools
+_services = {}
+_services_lock = threading.Lock()
+
+def _service(name, factory):
+    with _services_lock:
+        service = _services.get(name)
+        if service is None:
+            service = _services[name] = factory()
+        return service
+
+def get_cover_store():
+    from cover_store import CoverStore
+    return _service('covers', lambda: CoverStore(COVERS_DIR))
+
+def get_thumbnail_cache():
+    from cover_thumbnails import ThumbnailCache
+    return _service('thumbnails', lambda: ThumbnailCache(THUMBNAILS_DIR))
+
+def get_lyrics_service():
+    from lyrics_service import LyricsService
+    return _service('lyrics', lambda: LyricsService(LYRICS_DIR))
 
 def save_selected_folders(folders):
     try:
@@ -21,10 +50,21 @@ def load_selected_folders():
         pass
     return []
 
+def _dump_pickle(obj, path):
+    # Written to a private temp file and swapped in, so a crash or a second
+    # saver thread never leaves a truncated pickle behind
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            pickle.dump(obj, f)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
 def save_tags_cache(tags_cache):
     try:
-        with open(TAGS_CACHE_FILE, 'wb') as f:
-            pickle.dump(tags_cache, f)
+        _dump_pickle(tags_cache, TAGS_CACHE_FILE)
     except Exception:
         pass
 
@@ -32,6 +72,35 @@ def load_tags_cache():
     try:
         if os.path.exists(TAGS_CACHE_FILE):
             with open(TAGS_CACHE_FILE, 'rb') as f:
+                tags_cache = pickle.load(f)
+            if migrate_cover_bytes(tags_cache):
+                save_tags_cache(tags_cache)
+            return tags_cache
+    except Exception:
+        pass
+    return {}
+
+def migrate_cover_bytes(tags_cache):
+    # Older caches held the raw picture bytes in tags['cover']; move them to
+    # the cover store and keep only the reference
+    changed = False
+    for tags in tags_cache.values():
+        if 'cover' in tags:
+            cover = tags.pop('cover')
+            tags['cover_id'] = get_cover_store().put(cover) if cover else None
+            changed = True
+    return changed
+
+def save_scan_fingerprints(fingerprints):
+    try:
+        _dump_pickle(fingerprints, FINGERPRINTS_FILE)
+    except Exception:
+        pass
+
+def load_scan_fingerprints():
+    try:
+        if os.path.exists(FINGERPRINTS_FILE):
+            with open(FINGERPRINTS_FILE, 'rb') as f:
                 return pickle.load(f)
     except Exception:
         pass
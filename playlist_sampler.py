@@ -0,0 +1,126 @@
+import math
+import random
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+# Random playlist sampling that keeps one artist from dominating the result.
+# Tracks are grouped per artist; artists are visited in a shuffled weighted
+# round-robin (each visit takes a share of tracks proportional to the
+# artist's weight, by default its pool size) and each visit draws from that
+# artist's queue in random order, so building a playlist costs O(n) in its
+# length plus O(artists).
+
+DEFAULT_MAX_SHARE = 0.6  # No artist gets more than 60% of a playlist...
+# ...unless there are not enough other artists to fill it
+
+# Duration fitting (fit_duration): random picks until the playlist is within
+# FILL_WINDOW seconds of the target, then the gap is closed with the best
+# fitting tracks from a duration-sorted sample of at most FILLER_SAMPLE tracks.
+DEFAULT_DURATION_TOLERANCE = 60
+FILL_WINDOW = 15 * 60
+FILLER_SAMPLE = 4096
+MAX_DRAWS = 20000
+
+
+def _take(songs, rng):
+    # Lazy Fisher-Yates: a uniformly random song in O(1), no upfront shuffle
+    i = rng.randrange(len(songs))
+    songs[i], songs[-1] = songs[-1], songs[i]
+    return songs.pop()
+
+
+def sample_by_artist(groups, n, max_per_artist=None, max_share=DEFAULT_MAX_SHARE, weights=None, fill=True,
+                     rng=random):
+    """Pick up to n tracks from {artist: [tracks]} with at most max_per_artist per artist.
+
+    max_per_artist defaults to ceil(max_share * n). Artists take turns; a
+    turn takes about weight / total weight * n tracks (at least one), where
+    weights(artist) defaults to the artist's number of tracks, so an artist
+    with 2,000 tracks comes up more often than one with 2. With fill, a playlist that cannot reach n tracks under the
+    cap is topped up from the remaining tracks, still round-robin. The lists
+    in groups are consumed. The result is shuffled.
+    """
+    n = min(max(0, int(n)), sum(len(songs) for songs in groups.values()))
+    if max_per_artist is None:
+        max_per_artist = max(1, math.ceil(max_share * n))
+    artists = [artist for artist, songs in groups.items() if songs]
+    rng.shuffle(artists)
+    counts = dict.fromkeys(artists, 0)
+    weight = {a: max(0.0, float(weights(a))) for a in artists} if weights else {a: len(groups[a]) for a in artists}
+    total = sum(weight.values()) or 1.0
+    # Tracks per turn; one pass over all artists yields roughly n of them
+    turn = {a: max(1, round(weight[a] * n / total)) for a in artists}
+    playlist = []
+
+    def run(cap):
+        active = deque(a for a in artists if groups[a] and (cap is None or counts[a] < cap))
+        while active and len(playlist) < n:
+            artist = active.popleft()
+            songs = groups[artist]
+            quota = turn[artist]
+            if cap is not None:
+                quota = min(quota, cap - counts[artist])
+            quota = min(quota, len(songs), n - len(playlist))
+            for _ in range(quota):
+                playlist.append(_take(songs, rng))
+            counts[artist] += quota
+            if songs and (cap is None or counts[artist] < cap):
+                active.append(artist)
+
+    run(max_per_artist)
+    if fill and len(playlist) < n:
+        run(None)
+    rng.shuffle(playlist)
+    return playlist
+
+
+def fit_duration(tracks, duration_of, target, tolerance=DEFAULT_DURATION_TOLERANCE, rng=random):
+    """Pick random tracks whose durations add up to target seconds, within tolerance if possible.
+
+    duration_of(track) returns seconds; tracks of unknown (0) length are
+    skipped. Tracks are drawn lazily, so the pool is never shuffled as a
+    whole, and the work is bounded by MAX_DRAWS + FILLER_SAMPLE draws.
+    Returns (playlist, total_seconds); the playlist is shuffled.
+    """
+    pool = list(tracks)
+    playlist = []
+    total = 0.0
+    window = min(FILL_WINDOW, target / 2)
+    draws = 0
+    while pool and draws < MAX_DRAWS and target - total > window:
+        draws += 1
+        track = _take(pool, rng)
+        duration = duration_of(track)
+        if 0 < duration <= target - total:
+            playlist.append(track)
+            total += duration
+    # Close the gap from a duration-sorted sample of the remaining tracks
+    fillers = []
+    while pool and len(fillers) < FILLER_SAMPLE:
+        track = _take(pool, rng)
+        duration = duration_of(track)
+        if duration > 0:
+            fillers.append((duration, track))
+    fillers.sort(key=lambda item: item[0])
+    lengths = [duration for duration, _ in fillers]
+    while lengths and target - total > tolerance:
+        remaining = target - total
+        # A single track that lands within the tolerance finishes the playlist
+        i = bisect_left(lengths, remaining)
+        best = min((j for j in (i - 1, i) if 0 <= j < len(lengths)), key=lambda j: abs(lengths[j] - remaining))
+        if abs(lengths[best] - remaining) > tolerance:
+            # Otherwise take the longest track that still fits and try again
+            best = bisect_right(lengths, remaining) - 1
+            if best < 0:
+                break  # Everything left is too long
+        lengths.pop(best)
+        duration, track = fillers.pop(best)
+        playlist.append(track)
+        total += duration
+    if not playlist and lengths:
+        # Every track is longer than the target; the shortest one comes closest
+        duration, track = fillers[0]
+        playlist.append(track)
+        total += duration
+    rng.shuffle(playlist)
+    return playlist, total
@@ -0,0 +1,277 @@
+import os
+import sys
+import threading
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Compact in-memory track table. Every track gets a dense integer id; its
+# path is interned once and the filterable fields live in typed arrays
+# (string fields as codes into a deduplicated vocabulary), so filters are
+# masks over a few columns instead of dict lookups per track. NumPy is used
+# for the masks when installed, otherwise the same filters run in Python.
+
+
+class Vocabulary:
+    """Distinct strings with dense integer codes; code 0 is the empty string."""
+
+    def __init__(self):
+        self.strings = ['']
+        self.lowered = ['']
+        self._codes = {'': 0}
+
+    def code(self, value):
+        value = str(value) if value else ''
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.strings)
+            value = sys.intern(value)
+            self._codes[value] = code
+            self.strings.append(value)
+            self.lowered.append(value.lower())
+        return code
+
+    def copy(self):
+        other = Vocabulary()
+        other.strings = self.strings[:]
+        other.lowered = self.lowered[:]
+        other._codes = dict(self._codes)
+        return other
+
+    def matching(self, predicate):
+        """Codes whose lowercased string satisfies predicate, each string tested once."""
+        return {code for code, s in enumerate(self.lowered) if predicate(s)}
+
+    def fuzzy_matching(self, keywords, threshold, workers=1):
+        """Codes whose lowercased string scores >= threshold (fuzz.ratio) against any keyword.
+
+        All keywords are scored against the whole vocabulary in one
+        rapidfuzz.process.cdist call; workers=-1 uses every core.
+        """
+        from rapidfuzz import fuzz, process
+        queries = list({kw.lower() for kw in keywords if kw})
+        if not queries:
+            return set()
+        choices = self.lowered[:]  # The scanner may append while we score
+        if np is not None:
+            scores = process.cdist(queries, choices, scorer=fuzz.ratio, score_cutoff=threshold, workers=workers)
+            return set(np.flatnonzero((scores >= threshold).any(axis=0)).tolist())
+        # cdist needs NumPy; extract still scores each distinct string once per keyword
+        codes = set()
+        for query in queries:
+            for _, _, code in process.extract(query, choices, scorer=fuzz.ratio, score_cutoff=threshold, limit=None):
+                codes.add(code)
+        return codes
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class TrackCatalog:
+    """Tracks by integer id with columnar title/artist/album codes, year and duration.
+
+    Ids stay stable for the lifetime of the catalog; removed tracks leave a
+    dead slot behind. Safe to update from a scan thread while reading.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.paths = []  # id -> path, None once removed
+        self._ids = {}
+        self.titles = Vocabulary()
+        self.artists = Vocabulary()
+        self.albums = Vocabulary()
+        self.title_code = array('i')
+        self.artist_code = array('i')
+        self.album_code = array('i')
+        self.year = array('i')  # 0 when unknown
+        self.duration = array('f')  # Seconds, 0 when unknown
+        self.alive = array('b')
+        self._live = 0
+        # Vocabulary code -> ids, so matched artists/albums map straight to tracks
+        self._artist_tracks = {}
+        self._album_tracks = {}
+
+    @classmethod
+    def build(cls, items):
+        """Create a catalog from (path, tags) pairs."""
+        catalog = cls()
+        for path, tags in items:
+            catalog.add(path, tags)
+        return catalog
+
+    def copy(self):
+        """Independent copy with the same ids, to be updated off to the side."""
+        other = TrackCatalog()
+        with self._lock:
+            other.paths = self.paths[:]
+            other._ids = dict(self._ids)
+            other.titles, other.artists, other.albums = self.titles.copy(), self.artists.copy(), self.albums.copy()
+            other.title_code = self.title_code[:]
+            other.artist_code = self.artist_code[:]
+            other.album_code = self.album_code[:]
+            other.year = self.year[:]
+            other.duration = self.duration[:]
+            other.alive = self.alive[:]
+            other._live = self._live
+            other._artist_tracks = {code: set(ids) for code, ids in self._artist_tracks.items()}
+            other._album_tracks = {code: set(ids) for code, ids in self._album_tracks.items()}
+        return other
+
+    def add(self, path, tags):
+        """Add a track or update its fields in place; returns its id."""
+        year = tags.get('year')
+        year = year if isinstance(year, int) else 0
+        duration = float(tags.get('duration') or 0)
+        with self._lock:
+            title = self.titles.code(tags.get('title'))
+            artist = self.artists.code(tags.get('artist'))
+            album = self.albums.code(tags.get('album'))
+            track_id = self._ids.get(path)
+            if track_id is None:
+                track_id = len(self.paths)
+                path = sys.intern(path)
+                self._ids[path] = track_id
+                self.paths.append(path)
+                self.title_code.append(title)
+                self.artist_code.append(artist)
+                self.album_code.append(album)
+                self.year.append(year)
+                self.duration.append(duration)
+                self.alive.append(1)
+                self._live += 1
+            else:
+                self._unlink(track_id)
+                self.title_code[track_id] = title
+                self.artist_code[track_id] = artist
+                self.album_code[track_id] = album
+                self.year[track_id] = year
+                self.duration[track_id] = duration
+            self._artist_tracks.setdefault(artist, set()).add(track_id)
+            self._album_tracks.setdefault(album, set()).add(track_id)
+            return track_id
+
+    def _unlink(self, track_id):
+        for postings, code in ((self._artist_tracks, self.artist_code[track_id]),
+                               (self._album_tracks, self.album_code[track_id])):
+            ids = postings.get(code)
+            if ids is not None:
+                ids.discard(track_id)
+                if not ids:
+                    del postings[code]
+
+    def remove(self, path):
+        """Drop a track; returns its former id, or None if it was unknown."""
+        with self._lock:
+            track_id = self._ids.pop(path, None)
+            if track_id is not None:
+                self._unlink(track_id)
+                self.paths[track_id] = None
+                self.alive[track_id] = 0
+                self._live -= 1
+            return track_id
+
+    def id_of(self, path):
+        return self._ids.get(path)
+
+    def path_of(self, track_id):
+        return self.paths[track_id]
+
+    def paths_of(self, ids):
+        paths = self.paths
+        return [paths[i] for i in ids]
+
+    def ids(self):
+        """Ids of all live tracks."""
+        with self._lock:
+            return [i for i, alive in enumerate(self.alive) if alive]
+
+    def durations(self, ids):
+        with self._lock:
+            duration = self.duration
+            return [duration[i] for i in ids]
+
+    def group_by_artist(self, ids):
+        """{artist code: [ids]} for the given tracks; tracks without an artist share code 0."""
+        groups = {}
+        with self._lock:
+            artist_code = self.artist_code
+            for i in ids:
+                groups.setdefault(artist_code[i], []).append(i)
+        return groups
+
+    def fields(self, track_id):
+        """(title, artist, album, year, duration) of a track for display.
+
+        The title falls back to the file name; a year of 0 means unknown.
+        """
+        with self._lock:
+            title = self.titles.strings[self.title_code[track_id]] or os.path.basename(self.paths[track_id] or '')
+            return (title, self.artists.strings[self.artist_code[track_id]],
+                    self.albums.strings[self.album_code[track_id]], self.year[track_id], self.duration[track_id])
+
+    def __contains__(self, path):
+        return path in self._ids
+
+    def __len__(self):
+        return self._live
+
+    def select(self, ids=None, year_start=None, year_end=None, title_codes=None, album_codes=None,
+               artist_codes=None):
+        """Ids of live tracks matching every given filter, in id order.
+
+        ids restricts the result to a candidate set (e.g. from the genre
+        index). The *_codes filters are sets of vocabulary codes; artist and
+        album codes are resolved to tracks through their postings first.
+        Tracks without a year pass the year range, as they always have.
+        """
+        for codes in (title_codes, album_codes, artist_codes):
+            if codes is not None and not codes:
+                return []
+        with self._lock:
+            for postings, codes in ((self._artist_tracks, artist_codes), (self._album_tracks, album_codes)):
+                if codes is not None:
+                    matched = set().union(*(postings[c] for c in codes if c in postings))
+                    ids = matched if ids is None else matched.intersection(ids)
+            if np is not None:
+                return self._select_numpy(ids, year_start, year_end, title_codes)
+            return self._select_python(ids, year_start, year_end, title_codes)
+
+    def _select_numpy(self, ids, year_start, year_end, title_codes):
+        # Views are only held while the lock is, so the arrays can still grow
+        mask = np.frombuffer(self.alive, dtype=np.int8) != 0
+        if ids is not None:
+            candidates = np.zeros(len(mask), dtype=bool)
+            candidates[np.fromiter(ids, dtype=np.intp)] = True
+            mask &= candidates
+        if year_start or year_end:
+            year = np.frombuffer(self.year, dtype=np.intc)
+            if year_start:
+                mask &= (year == 0) | (year >= year_start)
+            if year_end:
+                mask &= (year == 0) | (year <= year_end)
+        if title_codes is not None:
+            codes = np.fromiter(title_codes, dtype=np.intc)
+            mask &= np.isin(np.frombuffer(self.title_code, dtype=np.intc), codes)
+        return np.flatnonzero(mask).tolist()
+
+    def _select_python(self, ids, year_start, year_end, title_codes):
+        if ids is None:
+            ids = range(len(self.paths))
+        else:
+            ids = sorted(ids)
+        alive, year, title_code = self.alive, self.year, self.title_code
+        result = []
+        for i in ids:
+            if not alive[i]:
+                continue
+            y = year[i]
+            if y and ((year_start and y < year_start) or (year_end and y > year_end)):
+                continue
+            if title_codes is not None and title_code[i] not in title_codes:
+                continue
+            result.append(i)
+        return result
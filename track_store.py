@@ -0,0 +1,340 @@
+import os
+import json
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+
+# SQLite-backed metadata index for the music library. Every track is one row,
+# so a rescan only writes the rows that changed (in batched transactions) and
+# startup only reads what it needs instead of parsing one huge JSON file.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS artists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS genres (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER,
+    size INTEGER,
+    inode INTEGER,
+    title TEXT,
+    artist_id INTEGER REFERENCES artists(id),
+    album TEXT,
+    year INTEGER,
+    duration INTEGER,
+    tags TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS track_genres (
+    track_id INTEGER NOT NULL REFERENCES tracks(id) ON DELETE CASCADE,
+    genre_id INTEGER NOT NULL REFERENCES genres(id),
+    PRIMARY KEY (track_id, genre_id)
+);
+CREATE INDEX IF NOT EXISTS idx_track_genres_genre ON track_genres(genre_id);
+CREATE INDEX IF NOT EXISTS idx_tracks_artist ON tracks(artist_id);
+CREATE INDEX IF NOT EXISTS idx_tracks_album ON tracks(album);
+CREATE INDEX IF NOT EXISTS idx_tracks_year ON tracks(year);
+"""
+
+# Rows are buffered and committed together; a crash loses at most one batch
+WRITE_BATCH_SIZE = 500
+
+
+class TrackStore:
+    """Per-track metadata in SQLite, safe to share between threads."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        folder = os.path.dirname(db_path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder, exist_ok=True)
+        self._lock = threading.RLock()
+        self._pending = []
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+    # --- Settings stored alongside the library ---
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    # --- Reads ---
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    def paths(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT path FROM tracks ORDER BY id")]
+
+    def has_track(self, path):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM tracks WHERE path = ?", (path,)).fetchone() is not None
+
+    def get_tags(self, path):
+        with self._lock:
+            row = self._conn.execute("SELECT tags FROM tracks WHERE path = ?", (path,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_tags(self, batch_size=1000):
+        """Yield (path, tags) for every track without loading them all at once."""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, path, tags FROM tracks WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for _, path, tags in rows:
+                yield path, json.loads(tags)
+            last_id = rows[-1][0]
+
+    def iter_summaries(self, batch_size=5000):
+        """Yield (path, {title, artist, album, year, duration}) from the indexed columns.
+
+        Cheaper than iter_tags: the JSON tag blobs are never parsed.
+        """
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT t.id, t.path, t.title, a.name, t.album, t.year, t.duration FROM tracks t "
+                    "LEFT JOIN artists a ON a.id = t.artist_id WHERE t.id > ? ORDER BY t.id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for _, path, title, artist, album, year, duration in rows:
+                yield path, {'title': title, 'artist': artist, 'album': album, 'year': year, 'duration': duration}
+            last_id = rows[-1][0]
+
+    def fingerprints(self):
+        """Return {path: (mtime_ns, size, inode)} for the incremental scanner.
+
+        Rows migrated without a fingerprint are left out, so the scanner
+        trusts their tags once and records a fingerprint for them.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, mtime_ns, size, inode FROM tracks WHERE mtime_ns IS NOT NULL"
+            ).fetchall()
+        return {path: (mtime, size, inode) for path, mtime, size, inode in rows}
+
+    def fingerprint(self, path):
+        """(mtime_ns, size, inode) recorded for path, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns, size, inode FROM tracks WHERE path = ? AND mtime_ns IS NOT NULL", (path,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def iter_track_genres(self):
+        """Yield (path, [genres]) for every track that has genres."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t.path, g.name FROM track_genres tg JOIN tracks t ON t.id = tg.track_id "
+                "JOIN genres g ON g.id = tg.genre_id ORDER BY tg.track_id"
+            ).fetchall()
+        path, genres = None, []
+        for row_path, genre in rows:
+            if row_path != path:
+                if genres:
+                    yield path, genres
+                path, genres = row_path, []
+            genres.append(genre)
+        if genres:
+            yield path, genres
+
+    def genres(self):
+        """Genres used by at least one track."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name FROM genres WHERE id IN (SELECT DISTINCT genre_id FROM track_genres)"
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    # --- Writes ---
+
+    def put(self, path, tags, fingerprint):
+        """Queue one track for writing; rows are committed in batches."""
+        with self._lock:
+            self._pending.append((path, tags, fingerprint))
+            if len(self._pending) >= WRITE_BATCH_SIZE:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            rows, self._pending = self._pending, []
+            with self._conn:
+                for path, tags, fingerprint in rows:
+                    self._write_row(path, tags, fingerprint)
+
+    def set_fingerprints(self, fingerprints):
+        """Record {path: fingerprint} for tracks whose tags are unchanged."""
+        with self._lock:
+            self.flush()
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE tracks SET mtime_ns = ?, size = ?, inode = ? WHERE path = ?",
+                    ((fp[0], fp[1], fp[2], path) for path, fp in fingerprints.items())
+                )
+
+    def invalidate(self, extension):
+        """Make the next scan re-read the tracks whose path ends in extension (e.g. ".mp3")."""
+        with self._lock:
+            self.flush()
+            with self._conn:
+                # A fingerprint no file has; the rows stay until the scan replaces them
+                self._conn.execute("UPDATE tracks SET mtime_ns = -1 WHERE lower(path) LIKE ?",
+                                   ("%" + extension.lower(),))
+
+    def delete(self, paths):
+        with self._lock:
+            self.flush()
+            with self._conn:
+                self._conn.executemany("DELETE FROM tracks WHERE path = ?", ((p,) for p in paths))
+
+    def clear(self):
+        with self._lock:
+            self._pending = []
+            with self._conn:
+                self._conn.execute("DELETE FROM tracks")
+                self._conn.execute("DELETE FROM artists")
+                self._conn.execute("DELETE FROM genres")
+                self._conn.execute("DELETE FROM meta")
+
+    def _name_id(self, table, name):
+        row = self._conn.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()
+        if row:
+            return row[0]
+        return self._conn.execute(f"INSERT INTO {table} (name) VALUES (?)", (name,)).lastrowid
+
+    def _write_row(self, path, tags, fingerprint):
+        mtime, size, inode = fingerprint if fingerprint else (None, None, None)
+        artist = (tags.get('artist') or '').strip()
+        artist_id = self._name_id("artists", artist) if artist else None
+        year = tags.get('year')
+        # Upsert keeps the row id stable for files that changed in place
+        self._conn.execute(
+            "INSERT INTO tracks (path, mtime_ns, size, inode, title, artist_id, album, year, duration, tags) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET mtime_ns = excluded.mtime_ns, size = excluded.size, "
+            "inode = excluded.inode, title = excluded.title, artist_id = excluded.artist_id, "
+            "album = excluded.album, year = excluded.year, duration = excluded.duration, tags = excluded.tags",
+            (path, mtime, size, inode, tags.get('title'), artist_id, tags.get('album'),
+             year if isinstance(year, int) else None, tags.get('duration'), json.dumps(tags))
+        )
+        track_id = self._conn.execute("SELECT id FROM tracks WHERE path = ?", (path,)).fetchone()[0]
+        self._conn.execute("DELETE FROM track_genres WHERE track_id = ?", (track_id,))
+        for genre in set(tags.get('genres', [])):
+            self._conn.execute("INSERT INTO track_genres (track_id, genre_id) VALUES (?, ?)",
+                               (track_id, self._name_id("genres", genre)))
+
+    # --- Migration from the old JSON cache ---
+
+    def migrate_json_cache(self, json_path):
+        """Import a legacy scan_cache.json once, then rename it out of the way.
+
+        Returns True if a cache was imported.
+        """
+        if not os.path.isfile(json_path) or not os.path.getsize(json_path) or self.count():
+            return False
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except Exception as e:
+            print(f"[WARNING] Could not migrate scan cache: {e}")
+            return False
+        tags_cache = cache.get("tags_cache", {})
+        fingerprints = cache.get("fingerprints", {})
+        with self._lock, self._conn:
+            for path in cache.get("audio_files", []):
+                tags = tags_cache.get(path)
+                if tags is not None:
+                    self._write_row(path, tags, fingerprints.get(path))
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                               ("folders", json.dumps(cache.get("folders", []))))
+            if cache.get("folder_input_value") is not None:
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                   ("folder_input_value", json.dumps(cache["folder_input_value"])))
+        os.replace(json_path, json_path + ".migrated")
+        return True
+
+
+class StoredTagsCache(MutableMapping):
+    """Dict-like tags cache that reads rows from a TrackStore on first access.
+
+    Writes only update the in-memory copy; persist with TrackStore.put.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._memo = {}
+        self._removed = set()
+
+    def __getitem__(self, path):
+        tags = self._memo.get(path)
+        if tags is None:
+            if path in self._removed:
+                raise KeyError(path)
+            tags = self.store.get_tags(path)
+            if tags is None:
+                raise KeyError(path)
+            self._memo[path] = tags
+        return tags
+
+    def __setitem__(self, path, tags):
+        self._removed.discard(path)
+        self._memo[path] = tags
+
+    def __delitem__(self, path):
+        if path not in self:
+            raise KeyError(path)
+        self._memo.pop(path, None)
+        self._removed.add(path)
+
+    def __contains__(self, path):
+        if path in self._memo:
+            return True
+        return path not in self._removed and self.store.has_track(path)
+
+    def __iter__(self):
+        seen = set()
+        for path in self.store.paths():
+            if path not in self._removed:
+                seen.add(path)
+                yield path
+        for path in list(self._memo):
+            if path not in seen:
+                yield path
+
+    def __len__(self):
+        return sum(1 for _ in self)